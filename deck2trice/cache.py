@@ -0,0 +1,129 @@
+from collections import OrderedDict
+import copy
+from functools import wraps
+import inspect
+import threading
+import time
+from typing import *
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key and memoizes their results.
+
+    The first caller for a key (the leader) runs the function, every caller
+    arriving while it is in flight waits and receives the same result. Results
+    are kept in a bounded LRU memo for `ttl` seconds. Errors are never memoized.
+
+    With `copy_results`, a result handed to more than one caller (followers,
+    memo hits) is deep-copied for each of them, so mutating it never leaks into
+    the memo or other callers. A result nobody else sees is returned as is.
+    """
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 32, copy_results=False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.copy_results = copy_results
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._memo: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def configure(self, ttl: Optional[float] = None, maxsize: Optional[int] = None):
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if maxsize is not None:
+                self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+
+    def _evict(self):
+        while self._memo and len(self._memo) > max(self.maxsize, 0):
+            self._memo.popitem(last=False)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            hit = self._memo.get(key)
+            if hit is not None:
+                if time.monotonic() - hit[0] < self.ttl:
+                    self._memo.move_to_end(key)
+                    return self._share(hit[1])
+                del self._memo[key]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return self._share(call.result)
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                shared = call.followers > 0
+                if call.error is None and self.ttl > 0 and self.maxsize > 0:
+                    self._memo[key] = (time.monotonic(), call.result)
+                    self._memo.move_to_end(key)
+                    self._evict()
+                    shared = True
+            call.done.set()
+        return self._share(call.result) if shared else call.result
+
+    def _share(self, result):
+        return copy.deepcopy(result) if self.copy_results else result
+
+
+# Shared by every DeckSource in the process, so a deck listed under two
+# accounts (or requested by two threads) is only fetched once. The memo stays
+# small: a sync fetches each deck once, so it only has to cover short bursts of
+# repeats without holding the payload of every deck fetched.
+deck_cache = SingleFlight(copy_results=True)
+
+
+def coalesced(key: Optional[Callable] = None, flight: SingleFlight = deck_cache):
+    """Decorator routing a DeckSource method through `flight`.
+
+    The key is the class name, the method name and either `key(self, ...)` or
+    the call's arguments, bound to the method's signature so that positional and
+    keyword calls share an entry. Results are shared as `flight` shares them,
+    deep copies for the default `deck_cache`.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            if key is not None:
+                extra = key(*bound.args, **bound.kwargs)
+            else:
+                extra = (bound.args[1:], tuple(sorted(bound.kwargs.items())))
+            return flight.do(
+                (type(self).__name__, method.__name__, extra), method, *bound.args, **bound.kwargs
+            )
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,9 @@
+from collections import defaultdict
+import csv
 from dataclasses import dataclass, field
+import io
 import json
+import os
 from pathlib import Path
 from typing import *
 from abc import ABC, abstractmethod
@@ -11,6 +15,7 @@ import re
 import requests
 from absl import logging
 from .utils import _pretty_print
+from .cache import coalesced
 import random
 import curl_cffi
 
@@ -43,20 +48,22 @@ class DeckList:
     tokens: List[MTGCard] = field(default_factory=lambda: [])
     themes: List[str] = field(default_factory=lambda: [])
 
-    def to_trice(self, trice_path=Path("decks")):
+    def to_trice(self, trice_path=Path("decks"), filename=None):
         trice_path.mkdir(parents=True, exist_ok=True)
-        # for card in self.companions + self.commanders:
-        for card in self.commanders:
-            self.sideboard.append(card)
-        to_trice(
+        # Commanders go in the sideboard zone; build a new list so the DeckList
+        # itself is left untouched for indexing and repeated writes
+        # sideboard = self.sideboard + self.companions + self.commanders
+        sideboard = self.sideboard + self.commanders
+        return to_trice(
             self.mainboard,
-            self.sideboard,
+            sideboard,
             self.name,
             self.description,
             commanders=self.commanders,
             deck_format=self.format,
             themes=self.themes,
             trice_path=trice_path,
+            filename=filename,
         )
 
     @staticmethod
@@ -201,6 +208,7 @@ class MoxField(DeckSource):
     username: str = ""
 
     # xmageFolderPath = ""
+    @coalesced(key=lambda self: self.username)
     def getUserDecks(self):
         url = (
             "https://api.moxfield.com/v2/users/"
@@ -214,6 +222,7 @@ class MoxField(DeckSource):
         # printJson(j)
         return j
 
+    @coalesced()
     def getDecklist(self, deckId):
         # https://api.moxfield.com/v2/decks/all/g5uBDBFSe0OzEoC_jRInQw
         url = "https://api.moxfield.com/v2/decks/all/" + deckId
@@ -231,6 +240,7 @@ class MoxField(DeckSource):
 class Archidekt(DeckSource):
     username: str = ""
 
+    @coalesced(key=lambda self: self.username)
     def getUserDecks(self):
         """Fetch all public decks for a user from Archidekt"""
         # Archidekt API v3 endpoint for user's decks
@@ -239,6 +249,7 @@ class Archidekt(DeckSource):
         j = json.loads(r.text)
         return j
 
+    @coalesced()
     def getDecklist(self, deck_id: str):
         """Fetch a specific deck by ID from Archidekt"""
         url = f"https://archidekt.com/api/decks/{deck_id}/"
@@ -250,16 +261,189 @@ class Archidekt(DeckSource):
         """Parse Archidekt API response into DeckList"""
         return DeckList.from_json(json_data, source="archidekt")
 
+# Deck exports LocalFiles knows how to read
+LOCAL_DECK_SUFFIXES = (".json", ".csv", ".txt")
+
+# "1 Sol Ring", "1x Sol Ring (C21) 263", "1x Sol Ring (c21) 263 *F* [Artifact]"
+_TEXT_LINE = re.compile(
+    r"^(?P<quantity>\d+)\s*x?\s+(?P<name>.+?)"
+    r"(?:\s+\((?P<set>[A-Za-z0-9]+)\)(?:\s+(?P<cn>[^\s*\[]+))?)?"
+    r"(?:\s+\*[A-Za-z]+\*)*"
+    r"(?:\s+\[(?P<category>[^\]]*)\])?\s*$"
+)
+
+# "Commander", "SIDEBOARD:", "// Maybeboard", "Sideboard (15)"
+_SECTION_HEADER = re.compile(
+    r"^(?:/+|#+)?\s*(?P<label>about|commanders?|companions?|deck|main(?:\s*deck|board)?|"
+    r"side(?:board)?|maybe(?:board)?|considering|tokens?)\s*(?:\(\d+\))?\s*:?$",
+    re.IGNORECASE,
+)
+
+_CSV_COLUMNS = {
+    "quantity": ("count", "quantity", "qty", "amount"),
+    "name": ("name", "card name", "card"),
+    "set_code": ("edition", "set", "set code", "edition code"),
+    "collector_number": ("collector number", "collector_number", "cn", "number"),
+    "uuid": ("scryfall id", "scryfall_id", "scryfall uuid"),
+    "category": ("board", "category", "categories", "section", "zone"),
+}
+
+
+def _zone_for(label: str) -> str:
+    """Map a section header or category label to a DeckList zone."""
+    label = label.lower()
+    for keyword, zone in (
+        ("commander", "commanders"),
+        ("companion", "companions"),
+        ("maybe", "maybeboard"),
+        ("considering", "maybeboard"),
+        ("side", "sideboard"),
+        ("token", "tokens"),
+    ):
+        if keyword in label:
+            return zone
+    return "mainboard"
+
+
+@dataclass
+class LocalFiles(DeckSource):
+    """Deck exports on disk (Moxfield/Archidekt JSON dumps, CSV and text lists).
+
+    Deck ids are paths relative to `root`, so no network access is ever made.
+    """
+
+    root: str = ""
+
+    def getUserDecks(self):
+        """List every deck export under `root`, in a stable order."""
+        root = Path(self.root).expanduser()
+        decks = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if filename.lower().endswith(LOCAL_DECK_SUFFIXES):
+                    fp = Path(dirpath) / filename
+                    decks.append({
+                        "id": fp.relative_to(root).as_posix(),
+                        "updatedAt": fp.stat().st_mtime,
+                    })
+        return {"results": decks}
+
+    def getDecklist(self, deck_id: str):
+        """Read a deck export. Parsing is left to parse_deck."""
+        fp = Path(self.root).expanduser() / deck_id
+        return {
+            "id": deck_id,
+            "name": fp.stem,
+            "kind": fp.suffix.lower().lstrip("."),
+            "content": fp.read_text(encoding="utf-8-sig"),
+        }
+
+    def parse_deck(self, json_data: dict) -> "DeckList":
+        """Parse a local deck export into DeckList, detecting its format"""
+        kind = json_data["kind"]
+        if kind == "json":
+            decklist = LocalFiles._parse_json(json.loads(json_data["content"]))
+        elif kind == "csv":
+            decklist = LocalFiles._parse_csv(json_data["content"])
+        else:
+            decklist = LocalFiles._parse_text(json_data["content"])
+        decklist.name = decklist.name or json_data["name"]
+        return decklist
+
+    @staticmethod
+    def _parse_json(data):
+        if isinstance(data, dict) and isinstance(data.get("cards"), list):
+            return DeckList.from_json(data, source="archidekt")
+        if isinstance(data, dict) and "boards" in data:
+            # Moxfield v3 dumps nest each board and key its cards by id
+            for board, contents in data["boards"].items():
+                data.setdefault(board, {
+                    entry["card"]["name"]: entry for entry in contents.get("cards", {}).values()
+                })
+        if isinstance(data, dict) and isinstance(data.get("mainboard"), dict):
+            for board in ("sideboard", "commanders", "companions"):
+                data.setdefault(board, {})
+            data.setdefault("description", "")
+            data.setdefault("format", "")
+            data.setdefault("name", "")
+            return DeckList.from_json(data, source="moxfield")
+        raise ValueError("Unrecognized JSON deck export")
+
+    @staticmethod
+    def _parse_csv(content: str):
+        rows = csv.DictReader(io.StringIO(content))
+        header = {(h or "").strip().lower(): h for h in rows.fieldnames or []}
+        columns = {
+            field: next((header[c] for c in candidates if c in header), None)
+            for field, candidates in _CSV_COLUMNS.items()
+        }
+        if columns["name"] is None:
+            raise ValueError("CSV deck export has no card name column")
+
+        zones = defaultdict(list)
+        for row in rows:
+            values = {
+                field: (row.get(column) or "").strip() if column else ""
+                for field, column in columns.items()
+            }
+            if not values["name"]:
+                continue
+            zones[_zone_for(values["category"])].append(MTGCard(
+                name=values["name"],
+                quantity=int(values["quantity"] or 1),
+                set_code=values["set_code"].upper(),
+                collector_number=values["collector_number"],
+                uuid=values["uuid"],
+            ))
+        return DeckList(zones.pop("mainboard", []), **zones)
+
+    @staticmethod
+    def _parse_text(content: str):
+        zones = defaultdict(list)
+        zone = "mainboard"
+        saw_header = False
+        name = ""
+        for line in content.splitlines():
+            line = line.strip()
+            if not line:
+                # MTGA/Moxfield text exports separate the sideboard by a blank line
+                if not saw_header and zones["mainboard"]:
+                    zone = "sideboard"
+                continue
+            if line.lower().startswith("name "):
+                name = line[5:].strip()
+                continue
+            match = _TEXT_LINE.match(line)
+            if match is None:
+                header = _SECTION_HEADER.match(line)
+                if header is None:
+                    # Comments and stray text never move cards to another zone
+                    logging.warning(f"Skipping unrecognized line in deck export: {line!r}")
+                    continue
+                zone = _zone_for(header["label"])
+                saw_header = True
+                continue
+            category = re.sub(r"\{[^}]*\}", "", match["category"] or "")
+            zones[_zone_for(category) if category else zone].append(MTGCard(
+                name=match["name"],
+                quantity=int(match["quantity"]),
+                set_code=(match["set"] or "").upper(),
+                collector_number=match["cn"] or "",
+            ))
+        return DeckList(zones.pop("mainboard", []), name=name, **zones)
+
 
 def create_deck_source(source: str, username: str = "") -> DeckSource:
     """Factory function to create a DeckSource instance based on the source type.
 
     Args:
-        source: The deck source type ('moxfield' or 'archidekt')
-        username: The username for the deck source
+        source: The deck source type ('moxfield', 'archidekt' or 'local')
+        username: The username for the deck source, or the directory holding
+            the deck exports for 'local'
 
     Returns:
-        A DeckSource instance (MoxField or Archidekt)
+        A DeckSource instance (MoxField, Archidekt or LocalFiles)
 
     Raises:
         ValueError: If the source type is unknown
@@ -269,8 +453,10 @@ def create_deck_source(source: str, username: str = "") -> DeckSource:
         return MoxField(username=username)
     elif source_lower == "archidekt":
         return Archidekt(username=username)
+    elif source_lower == "local":
+        return LocalFiles(root=username)
     else:
-        raise ValueError(f"Unknown deck source: {source}. Supported sources: moxfield, archidekt")
+        raise ValueError(f"Unknown deck source: {source}. Supported sources: moxfield, archidekt, local")
 
 
 def normlize_name(name):
@@ -288,6 +474,7 @@ def to_trice(
     deck_format=None,
     themes: List[str] = [],
     trice_path=Path("~/.local/share/Cockatrice/Cockatrice/decks"),
+    filename=None,
 ):
     root = ET.Element("cockatrice_deck")
     root.set("version", "1")
@@ -348,9 +535,12 @@ def to_trice(
     tree = ET.ElementTree(root)
     # ET.indent(tree, space="\t", level=0)
     # trice_path=
-    fp = trice_path / f"{normlize_name(name)}.cod"
+    # filename may place the deck in a subdirectory of trice_path
+    fp = trice_path / (filename or f"{normlize_name(name)}.cod")
+    fp.parent.mkdir(parents=True, exist_ok=True)
     logging.debug(f"Writing to {fp}")
     tree.write(fp, encoding="UTF-8", xml_declaration=True)
+    return fp
 
 
 def to_cards(raw_cards: dict, source="moxfield") -> List[MTGCard]:
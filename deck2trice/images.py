@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import os
+from pathlib import Path
+import threading
+import time
+from typing import *
+from urllib.parse import quote
+
+from absl import logging
+import curl_cffi
+from pathvalidate import sanitize_filename
+
+from .core import DeckList, MTGCard
+
+SCRYFALL_API = "https://api.scryfall.com"
+
+# Scryfall asks API clients for at most 10 requests per second
+SCRYFALL_RATE = 10.0
+
+# Statuses worth retrying: rate limited, or the server having a bad moment
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """Spaces out calls shared by several threads to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def image_url(card: MTGCard, base_url: str = SCRYFALL_API) -> str:
+    """Scryfall-style image URL for the exact printing of `card`."""
+    base_url = base_url.rstrip("/")
+    if card.set_code and card.collector_number:
+        return (
+            f"{base_url}/cards/{quote(card.set_code.lower())}/{quote(card.collector_number)}"
+            "?format=image&version=normal"
+        )
+    if card.uuid:
+        return f"{base_url}/cards/{quote(card.uuid)}?format=image&version=normal"
+    return f"{base_url}/cards/named?exact={quote(card.name)}&format=image&version=normal"
+
+
+def image_path(card: MTGCard, pics_path: Path) -> Path:
+    """Where Cockatrice looks for a downloaded picture of `card`.
+
+    Cockatrice keeps downloaded art in `downloadedPics/<SET>/<card name>.full.jpg`
+    under its pics directory.
+    """
+    name = sanitize_filename(card.name.replace(" // ", " "))
+    return pics_path / "downloadedPics" / card.set_code.upper() / f"{name}.full.jpg"
+
+
+class ImagePrefetcher:
+    """Downloads card images into Cockatrice's picture cache in the background.
+
+    Decks are added as they are synced, and each new image is downloaded right
+    away by a thread pool, overlapping with the rest of the sync. Images are
+    de-duplicated across decks and skipped if already on disk. Requests of all
+    threads share one rate limit, and rate limited or failed requests are
+    retried `retries` times with exponential backoff (or the server's
+    Retry-After).
+    """
+
+    def __init__(
+        self,
+        pics_path: Path,
+        base_url: str = SCRYFALL_API,
+        workers: int = 4,
+        rate: float = SCRYFALL_RATE,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.pics_path = Path(pics_path)
+        self.base_url = base_url
+        self.retries = retries
+        self.backoff = backoff
+        self._limiter = RateLimiter(rate)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        self._lock = threading.Lock()
+        self._seen: Set[Path] = set()
+        self._futures = []
+        self.stats = dict.fromkeys(("downloaded", "cached", "unresolved", "failed", "bytes"), 0)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def add(self, decklist: DeckList):
+        for zone in (
+            decklist.mainboard,
+            decklist.sideboard,
+            decklist.commanders,
+            decklist.companions,
+            decklist.maybeboard,
+            decklist.tokens,
+        ):
+            for card in zone:
+                self.add_card(card)
+
+    def add_card(self, card: MTGCard):
+        # Without a set code there is no way to know which folder Cockatrice reads
+        if not card.set_code:
+            self._count("unresolved")
+            return
+        path = image_path(card, self.pics_path)
+        with self._lock:
+            if path in self._seen:
+                return
+            self._seen.add(path)
+        if path.exists():
+            self._count("cached")
+            return
+        self._futures.append(self._executor.submit(self._download, image_url(card, self.base_url), path))
+
+    def _fetch(self, url: str) -> bytes:
+        for attempt in range(self.retries + 1):
+            self._limiter.wait()
+            try:
+                r = curl_cffi.get(url, impersonate="chrome", allow_redirects=True)
+            except Exception as e:
+                error, delay = f"{type(e).__name__}: {e}", None
+            else:
+                if r.status_code == 200 and r.content:
+                    return r.content
+                if r.status_code not in RETRY_STATUSES:
+                    raise ValueError(f"HTTP {r.status_code}")
+                error, delay = f"HTTP {r.status_code}", r.headers.get("Retry-After")
+            if attempt == self.retries:
+                raise ValueError(error)
+            try:
+                delay = float(delay)
+            except (TypeError, ValueError):
+                delay = self.backoff * 2 ** attempt
+            logging.debug(f"Retrying {url} in {delay:g}s after {error}")
+            time.sleep(delay)
+
+    def _download(self, url: str, path: Path):
+        try:
+            content = self._fetch(url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write next to the target and rename, so Cockatrice never reads a partial image
+            tmp = path.with_name(f".{path.name}.{threading.get_ident()}.part")
+            tmp.write_bytes(content)
+            os.replace(tmp, path)
+            self._count("downloaded")
+            self._count("bytes", len(content))
+        except Exception as e:
+            self._count("failed")
+            logging.warning(f"Failed to download {url}: {e}")
+
+    def pending(self) -> int:
+        return sum(not f.done() for f in self._futures)
+
+    def close(self) -> dict:
+        """Wait for all downloads to finish and return the statistics."""
+        wait(self._futures)
+        self._executor.shutdown()
+        return dict(self.stats)
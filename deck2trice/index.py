@@ -0,0 +1,196 @@
+from pathlib import Path
+import sqlite3
+import time
+from typing import *
+
+from .core import DeckList
+
+# Zones counted towards the cards a collection needs; maybeboard and tokens are
+# indexed but left out of the totals.
+PLAYED_ZONES = ("main", "side", "commander", "companion")
+
+# Deck ids are only unique within a source (and local imports reuse relative
+# paths across directories), so decks are keyed by source and id.
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    source TEXT NOT NULL DEFAULT '',
+    deck_id TEXT NOT NULL,
+    username TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    format TEXT NOT NULL DEFAULT '',
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (source, deck_id)
+);
+CREATE TABLE IF NOT EXISTS cards (
+    source TEXT NOT NULL,
+    deck_id TEXT NOT NULL,
+    card TEXT NOT NULL COLLATE NOCASE,
+    set_code TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    collector_number TEXT NOT NULL DEFAULT '',
+    zone TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    FOREIGN KEY (source, deck_id) REFERENCES decks(source, deck_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS cards_by_card ON cards(card, set_code);
+CREATE INDEX IF NOT EXISTS cards_by_deck ON cards(source, deck_id);
+"""
+
+
+def _deck_rows(source: str, deck_id: str, decklist: DeckList):
+    zones = [
+        ("main", decklist.mainboard),
+        ("side", decklist.sideboard),
+        ("commander", decklist.commanders),
+        ("companion", decklist.companions),
+        ("maybe", decklist.maybeboard),
+        ("token", decklist.tokens),
+    ]
+    for zone, cards in zones:
+        for card in cards:
+            yield (
+                source,
+                deck_id,
+                card.name,
+                card.set_code,
+                card.collector_number,
+                zone,
+                int(card.quantity),
+            )
+
+
+class CardIndex:
+    """On-disk inverted index from card name and printing to the decks using it.
+
+    Backed by SQLite, each deck is replaced atomically whenever it is synced, so
+    the index stays current without re-reading any `.cod` file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        version, = self.conn.execute("PRAGMA user_version").fetchone()
+        if version < _SCHEMA_VERSION:
+            # Indexes keyed by the bare deck id are rebuilt as decks are synced
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS cards")
+                self.conn.execute("DROP TABLE IF EXISTS decks")
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, deck_id: str, decklist: DeckList, source="", username=""):
+        """Replace the indexed contents of `deck_id` on `source` with `decklist`."""
+        deck_id = str(deck_id)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM cards WHERE source = ? AND deck_id = ?", (source, deck_id)
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO decks VALUES (?, ?, ?, ?, ?, ?)",
+                (source, deck_id, username, decklist.name, decklist.format, time.time()),
+            )
+            self.conn.executemany(
+                "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _deck_rows(source, deck_id, decklist),
+            )
+
+    def remove(self, deck_id: str, source=""):
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM decks WHERE source = ? AND deck_id = ?", (source, str(deck_id))
+            )
+
+    def deck_ids(self, source: str, username: str) -> List[str]:
+        """Ids of the indexed decks of `username` on `source`."""
+        return [
+            deck_id
+            for (deck_id,) in self.conn.execute(
+                "SELECT deck_id FROM decks WHERE source = ? AND username = ?",
+                (source, username),
+            )
+        ]
+
+    def prune(self, source: str, username: str, keep: Iterable[str]) -> List[str]:
+        """Drop decks of `username` on `source` that are not in `keep`."""
+        keep = {str(deck_id) for deck_id in keep}
+        stale = [deck_id for deck_id in self.deck_ids(source, username) if deck_id not in keep]
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM decks WHERE source = ? AND deck_id = ?",
+                [(source, d) for d in stale],
+            )
+        return stale
+
+    def decks_with(self, card: str, set_code: str = "") -> List[dict]:
+        """Decks containing `card` (case-insensitive), optionally of one set."""
+        query = """
+            SELECT d.source, d.deck_id, d.name, c.set_code, c.collector_number, c.zone, c.quantity
+            FROM cards c JOIN decks d USING (source, deck_id)
+            WHERE c.card = ?
+        """
+        params = [card]
+        if set_code:
+            query += " AND c.set_code = ?"
+            params.append(set_code)
+        query += " ORDER BY d.name, c.zone"
+        keys = ("source", "deck_id", "name", "set_code", "collector_number", "zone", "quantity")
+        return [dict(zip(keys, row)) for row in self.conn.execute(query, params)]
+
+    def totals(self, by_printing=False, limit: Optional[int] = None) -> List[dict]:
+        """Copies of each card needed across the collection, most used first.
+
+        `copies` is the sum over all decks, `max_copies` the most any single deck
+        runs, which is what a shared collection has to own at least.
+        """
+        columns = "card, set_code, collector_number" if by_printing else "card"
+        zones = ", ".join("?" for _ in PLAYED_ZONES)
+        query = f"""
+            SELECT {columns}, SUM(quantity), MAX(quantity), COUNT(*)
+            FROM (
+                SELECT source, deck_id, {columns}, SUM(quantity) AS quantity
+                FROM cards WHERE zone IN ({zones})
+                GROUP BY source, deck_id, {columns}
+            )
+            GROUP BY {columns}
+            ORDER BY SUM(quantity) DESC, card
+        """
+        params = list(PLAYED_ZONES)
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        keys = (
+            ("card", "set_code", "collector_number") if by_printing else ("card",)
+        ) + ("copies", "max_copies", "decks")
+        return [dict(zip(keys, row)) for row in self.conn.execute(query, params)]
+
+    def stats(self) -> dict:
+        """Collection-wide aggregate counts."""
+        decks, = self.conn.execute("SELECT COUNT(*) FROM decks").fetchone()
+        zones = ", ".join("?" for _ in PLAYED_ZONES)
+        cards, unique, printings = self.conn.execute(
+            f"""
+            SELECT COALESCE(SUM(quantity), 0), COUNT(DISTINCT card),
+                   COUNT(DISTINCT card || '|' || set_code || '|' || collector_number)
+            FROM cards WHERE zone IN ({zones})
+            """,
+            PLAYED_ZONES,
+        ).fetchone()
+        return {
+            "decks": decks,
+            "cards": cards,
+            "unique_cards": unique,
+            "unique_printings": printings,
+        }
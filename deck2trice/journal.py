@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import *
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def journal_path(directory: Path, source: str, username: str) -> Path:
+    """Journal of one account, so syncing another account never clobbers it."""
+    account = Path(username).name if source == "local" else username
+    account = re.sub(r"[^\w.-]+", "_", account).strip("._") or "account"
+    digest = hashlib.sha1(f"{source}:{username}".encode("utf-8")).hexdigest()[:8]
+    return Path(directory) / f"{source}-{account}-{digest}.journal"
+
+
+@dataclass
+class JournalState:
+    """Replayed state of the last run recorded in a journal."""
+
+    source: str = ""
+    username: str = ""
+    deck_ids: List[str] = field(default_factory=lambda: [])
+    done: Dict[str, str] = field(default_factory=lambda: {})
+    failed: Dict[str, str] = field(default_factory=lambda: {})
+    carried: List[str] = field(default_factory=lambda: [])
+    finished: bool = False
+
+    def pending(self) -> List[str]:
+        """Deck ids of the run that have not completed yet, in planned order."""
+        return [deck_id for deck_id in self.deck_ids if deck_id not in self.done]
+
+
+class SyncJournal:
+    """Append-only checkpoint journal of a sync run.
+
+    Each line is a JSON record: one `start` record listing the planned deck ids,
+    one `deck` record per deck as soon as it completes or fails and a `finish`
+    record once the run is over, listing the decks carried over to the next run
+    if it ran out of budget. Every record is flushed to disk on write, so a
+    crashed or interrupted run can be resumed from the last deck it finished.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fp = None
+
+    def load(self) -> Optional[JournalState]:
+        """Replay the journal. Returns None if there is no run recorded."""
+        if not self.path.exists():
+            return None
+        state = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash, everything before it holds
+                    continue
+                event = record.get("event")
+                if event == "start":
+                    state = JournalState(
+                        source=record.get("source", ""),
+                        username=record.get("username", ""),
+                        deck_ids=[str(d) for d in record.get("deck_ids", [])],
+                    )
+                elif state is None:
+                    continue
+                elif event == "deck":
+                    deck_id = str(record["id"])
+                    if record.get("status") == "done":
+                        state.done[deck_id] = record.get("path", "")
+                        state.failed.pop(deck_id, None)
+                    else:
+                        state.failed[deck_id] = record.get("error", "")
+                elif event == "finish":
+                    state.finished = True
+                    state.carried = [str(d) for d in record.get("carried", [])]
+        return state
+
+    def start(self, source: str, username: str, deck_ids: List[str], resume=False):
+        """Open the journal. A fresh run truncates it, a resumed run appends.
+
+        Raises RuntimeError if another process holds the journal, i.e. another
+        sync of the same account is still running.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.path, "a", encoding="utf-8")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.close()
+                raise RuntimeError(f"Another sync is using the journal {self.path}")
+        if not resume:
+            self._fp.truncate(0)
+            self._write(
+                event="start",
+                source=source,
+                username=username,
+                deck_ids=[str(d) for d in deck_ids],
+            )
+
+    def record(self, deck_id: str, status: str, **fields):
+        self._write(event="deck", id=str(deck_id), status=status, **fields)
+
+    def finish(self, **fields):
+        self._write(event="finish", **fields)
+        self.close()
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _write(self, **record):
+        if self._fp is None:
+            return
+        record.setdefault("time", time.time())
+        self._fp.write(json.dumps(record) + "\n")
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import *
+
+from absl import logging
+
+from .core import DeckList, normlize_name
+
+# "legacy" keeps the historical flat `<name>.cod` files, every other layout
+# makes filenames unique with a short hash of the deck id.
+LAYOUTS = ("legacy", "flat", "format", "themes", "account")
+
+MANIFEST_NAME = ".deck2trice-manifest.json"
+MANIFEST_VERSION = 2
+
+
+def deck_key(source: str, username: str, deck_id: str) -> str:
+    """Identity of a deck across sources and accounts.
+
+    Deck ids are only unique within a source, and local imports use paths
+    relative to their import directory, so the same id can name different decks.
+    """
+    return f"{source}:{username}:{deck_id}"
+
+
+def _directory(name: str, default: str) -> str:
+    return normlize_name(name).strip(". ") or default
+
+
+@dataclass(frozen=True)
+class Layout:
+    """Where each deck is written below the deck directory.
+
+    Layouts are pure functions of the deck, so worker processes can place decks
+    without sharing any state.
+    """
+
+    strategy: str = "legacy"
+    source: str = ""
+    username: str = ""
+
+    def __post_init__(self):
+        if self.strategy not in LAYOUTS:
+            raise ValueError(f"Unknown deck layout: {self.strategy}. Supported layouts: {', '.join(LAYOUTS)}")
+
+    def filename(self, deck_id: str, decklist: DeckList) -> str:
+        name = normlize_name(decklist.name)
+        if self.strategy == "legacy":
+            return f"{name}.cod"
+        key = deck_key(self.source, self.username, deck_id)
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+        return f"{name} ({digest}).cod"
+
+    def relpath(self, deck_id: str, decklist: DeckList) -> Path:
+        filename = self.filename(deck_id, decklist)
+        if self.strategy == "format":
+            return Path(_directory(decklist.format.capitalize(), "Other")) / filename
+        if self.strategy == "themes":
+            theme = decklist.themes[0] if decklist.themes else ""
+            return Path(_directory(theme, "Untagged")) / filename
+        if self.strategy == "account":
+            # Local imports use the import directory as their account
+            account = Path(self.username).name if self.source == "local" else self.username
+            return (
+                Path(_directory(self.source.capitalize(), "Other"))
+                / _directory(account, "Unknown")
+                / filename
+            )
+        return Path(filename)
+
+
+class Manifest:
+    """Index of the decks written to a deck directory, by source, account and id.
+
+    Stored as `.deck2trice-manifest.json` at the root of the deck directory. It
+    lets a renamed or moved deck replace its previous file and a deleted deck be
+    removed without scanning the tree, and only ever touches files it recorded.
+    Changes are kept in memory until `save`, which the sync calls once at the
+    end of the run (or when interrupted).
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self._dirty = False
+        self.decks: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.decks = data.get("decks", {})
+            if data.get("version", 1) < MANIFEST_VERSION:
+                # Version 1 was keyed by the bare deck id
+                self.decks = {
+                    deck_key(entry.get("source", ""), entry.get("username", ""), deck_id): {
+                        **entry,
+                        "deck_id": deck_id,
+                    }
+                    for deck_id, entry in self.decks.items()
+                }
+                self._dirty = True
+        self._owners = {entry["path"]: key for key, entry in self.decks.items()}
+
+    def record(self, deck_id: str, path: Path, name="", source="", username=""):
+        """Record that `deck_id` now lives at `path`, removing its previous file."""
+        deck_id = str(deck_id)
+        key = deck_key(source, username, deck_id)
+        relpath = Path(path).relative_to(self.root).as_posix()
+        owner = self._owners.get(relpath)
+        if owner is not None and owner != key:
+            logging.warning(
+                f"Decks <{self.decks.get(owner, {}).get('deck_id', owner)}> and <{deck_id}> are both "
+                f"written to {relpath}, use a --layout other than legacy for unique filenames"
+            )
+            self.decks.pop(owner, None)
+
+        previous = self.decks.get(key, {}).get("path")
+        if previous and previous != relpath and self._owners.get(previous) == key:
+            self._remove_file(previous)
+            logging.info(f"Moved deck <{deck_id}> from {previous} to {relpath}")
+
+        self.decks[key] = {
+            "deck_id": deck_id,
+            "path": relpath,
+            "name": name,
+            "source": source,
+            "username": username,
+        }
+        self._owners[relpath] = key
+        self._dirty = True
+
+    def deck_ids(self, source: str, username: str) -> List[str]:
+        """Ids of the recorded decks of `username` on `source`."""
+        return [
+            entry["deck_id"]
+            for entry in self.decks.values()
+            if entry.get("source") == source and entry.get("username") == username
+        ]
+
+    def prune(self, source: str, username: str, keep: Iterable[str]) -> List[str]:
+        """Delete the files of decks of `username` on `source` not in `keep`."""
+        keep = {str(deck_id) for deck_id in keep}
+        stale = [deck_id for deck_id in self.deck_ids(source, username) if deck_id not in keep]
+        for deck_id in stale:
+            entry = self.decks.pop(deck_key(source, username, deck_id))
+            self._remove_file(entry["path"])
+            logging.info(f"Removed deleted deck <{deck_id}> at {entry['path']}")
+        if stale:
+            self._dirty = True
+        return stale
+
+    def _remove_file(self, relpath: str):
+        self._owners.pop(relpath, None)
+        fp = self.root / relpath
+        # Never follow a hand-edited manifest out of the deck directory
+        if self.root.resolve() not in fp.resolve().parents:
+            logging.warning(f"Not removing {fp}, it is outside of {self.root}")
+            return
+        fp.unlink(missing_ok=True)
+        # Drop directories the layout left empty, up to the deck directory
+        for parent in fp.parents:
+            if parent == self.root or self.root not in parent.parents:
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+    def save(self):
+        if not self._dirty and self.path.exists():
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "decks": self.decks}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -1,15 +1,27 @@
 # %%
+from contextlib import nullcontext
+import os
 from pathlib import Path
 import time
 import platform
+import socket
 from typing import *
 
 from absl import app, flags, logging
 from ml_collections import config_flags
 from tqdm import tqdm
-from .core import create_deck_source
+from .core import DeckSource, create_deck_source
+from .cache import deck_cache
+from .images import SCRYFALL_API, SCRYFALL_RATE, ImagePrefetcher
+from .index import CardIndex
+from .journal import SyncJournal, journal_path
+from .layout import LAYOUTS, Layout, Manifest
+from .profiling import MemoryProfiler
+from .scheduler import Budget, parse_timestamp, prioritize
+from .sync import sync_deck, sync_decks
+from .workqueue import WorkQueue, create_work_queue
 from ._version import __version__
-from .utils import redirect_to_tqdm, relpath
+from .utils import redirect_to_tqdm, relpath, write_ndjson
 
 FLAGS = flags.FLAGS
 
@@ -34,6 +46,10 @@ def get_default_deckpath():
         # ~/.local/share/Cockatrice/Cockatrice/decks
         return str(Path.home() / ".local" / "share" / "Cockatrice" / "Cockatrice" / "decks")
 
+def get_default_picspath():
+    """Get OS-specific default path of Cockatrice's picture cache."""
+    return str(Path(get_default_deckpath()).parent / "pics")
+
 flags.DEFINE_boolean("configure", False, "Configure the application for subsequent runs.")
 
 flags.DEFINE_boolean("version", False, "Prints the version of the program and exits.")
@@ -52,6 +68,72 @@ flags.DEFINE_boolean("all_decks", False, "Fetch all decks from the user, ignorin
 
 flags.DEFINE_boolean("no_config", False, "Bypass config file reading and creation entirely. Requires --source and --username.")
 
+flags.DEFINE_enum("layout", "legacy", list(LAYOUTS), "How decks are arranged in the deck directory: 'legacy' (flat, named after the deck), 'flat', or subdirectories by 'format', 'themes' or 'account'. All but 'legacy' add a short deck id hash to filenames so they never collide.")
+
+flags.DEFINE_boolean("prune_deleted", True, "Remove the files of decks deleted from the deck site (only files deck2trice wrote).")
+
+flags.DEFINE_boolean("force_prune", False, "Prune deleted decks even when the deck listing is empty or less than half of the decks seen before.")
+
+flags.DEFINE_string("import_path", "", "Convert the deck exports (JSON, CSV and text) under this directory instead of fetching from a deck site.")
+
+flags.DEFINE_integer("jobs", 0, "Processes converting local deck exports in parallel with --import_path. 0 uses every CPU.")
+
+flags.DEFINE_float("memo_ttl", 300.0, "Seconds a fetched deck or deck listing is reused within this process. 0 disables memoization.")
+
+flags.DEFINE_integer("memo_size", 32, "Maximum number of fetched decks kept in memory for reuse. Concurrent fetches of a deck are always coalesced.")
+
+flags.DEFINE_boolean("resume", False, "Resume the last interrupted sync from its checkpoint journal instead of starting over.")
+
+flags.DEFINE_string("journal", str(Path.home() / ".deck2trice.journals"), "Directory of the checkpoint journals recording the progress of each sync, one per account.")
+
+flags.DEFINE_string("index", str(Path.home() / ".deck2trice.index.sqlite"), "Card to deck index updated as decks are synced. Empty disables it.")
+
+flags.DEFINE_string("find_card", "", "List the synced decks running this card (from the index) and exit.")
+
+flags.DEFINE_string("card_set", "", "Restrict --find_card to one printing's set code.")
+
+flags.DEFINE_boolean("card_totals", False, "Print the copies of each card needed across all synced decks (from the index) and exit.")
+
+flags.DEFINE_boolean("by_printing", False, "Group --card_totals by printing instead of card name.")
+
+flags.DEFINE_integer("limit", 0, "Maximum number of rows printed by --card_totals. 0 prints all.")
+
+flags.DEFINE_float("time_budget", 0, "Stop syncing cleanly after this many seconds and carry the remaining decks over to the next run. 0 is unlimited.")
+
+flags.DEFINE_integer("max_requests", 0, "Stop syncing cleanly after this many requests to the deck source and carry the remaining decks over to the next run. 0 is unlimited.")
+
+flags.DEFINE_string("queue", "", "Shared work queue: path of a SQLite file (e.g. on shared storage), or 'memory' for an in-process queue.")
+
+flags.DEFINE_boolean("enqueue", False, "Add the user's decks to --queue instead of syncing them. Combine with --worker to also process them.")
+
+flags.DEFINE_boolean("worker", False, "Lease decks from --queue, sync them and acknowledge them until the queue is drained.")
+
+flags.DEFINE_string("worker_id", "", "Name of this worker in the queue. Defaults to hostname:pid.")
+
+flags.DEFINE_float("visibility_timeout", 300.0, "Seconds a leased deck stays hidden from other workers before it is handed out again.")
+
+flags.DEFINE_integer("max_attempts", 3, "Times a deck is leased before it is marked failed in the queue, whether its sync failed or its lease expired.")
+
+flags.DEFINE_float("poll_interval", 5.0, "Seconds an idle worker waits before checking the queue for expired leases.")
+
+flags.DEFINE_boolean("prefetch_images", False, "Download the images of all synced cards into Cockatrice's picture cache.")
+
+flags.DEFINE_string("pics_path", get_default_picspath(), "Cockatrice pics directory images are prefetched into.")
+
+flags.DEFINE_string("image_base_url", SCRYFALL_API, "Base URL of the Scryfall-compatible API card images are downloaded from.")
+
+flags.DEFINE_integer("image_workers", 4, "Number of concurrent image downloads.")
+
+flags.DEFINE_float("image_rate", SCRYFALL_RATE, "Maximum image requests per second, across all --image_workers. 0 is unlimited.")
+
+flags.DEFINE_integer("image_retries", 3, "Times a rate limited or failed image download is retried, with exponential backoff.")
+
+flags.DEFINE_boolean("profile_memory", False, "Trace memory with tracemalloc and report the peak and per-stage allocations of each deck.")
+
+flags.DEFINE_float("memory_budget_mb", 0, "Fail the run if the traced peak memory exceeds this many MB. Implies --profile_memory.")
+
+flags.DEFINE_enum("output", "text", ["text", "ndjson"], "Output mode. 'ndjson' streams one JSON event per deck to stdout and disables progress bars.")
+
 
 def configure_interactive():
     """Interactive configuration setup."""
@@ -113,6 +195,216 @@ def configure_interactive():
     print("  deck2trice")
     print("\nUse --help to see available command-line options.")
 
+def _printing(row: dict) -> str:
+    if not row["set_code"]:
+        return ""
+    return f" ({row['set_code']}) {row['collector_number']}".rstrip()
+
+
+def query_index(index: CardIndex, ndjson=False):
+    """Answer --find_card / --card_totals from the card index."""
+    if FLAGS.find_card:
+        rows = index.decks_with(FLAGS.find_card, set_code=FLAGS.card_set)
+    else:
+        rows = index.totals(by_printing=FLAGS.by_printing, limit=FLAGS.limit)
+    stats = index.stats()
+
+    if ndjson:
+        event = "card" if FLAGS.find_card else "total"
+        for row in rows:
+            write_ndjson({"event": event, **row})
+        return write_ndjson({"event": "summary", **stats})
+
+    if FLAGS.find_card:
+        for row in rows:
+            printing = _printing(row)
+            print(f"{row['quantity']}x{printing} in {row['name']} <{row['deck_id']}> [{row['zone']}]")
+        print(f"{FLAGS.find_card}: {len({(r['source'], r['deck_id']) for r in rows})}/{stats['decks']} deck(s)")
+    else:
+        for row in rows:
+            printing = _printing(row) if FLAGS.by_printing else ""
+            print(f"{row['copies']:>5} {row['card']}{printing} (max {row['max_copies']} per deck, {row['decks']} deck(s))")
+        print(
+            f"{stats['decks']} deck(s), {stats['cards']} card(s), "
+            f"{stats['unique_cards']} unique card(s), {stats['unique_printings']} unique printing(s)"
+        )
+
+
+def abort_sync(source: str, username: str, error: Exception) -> int:
+    """Log why a sync could not start. In ndjson mode the failure is also
+    reported as the summary, so pipelines never see an empty stdout."""
+    logging.error(error)
+    if FLAGS.output == "ndjson":
+        write_ndjson({
+            "event": "summary",
+            "source": source,
+            "username": username,
+            "total": 0,
+            "failed": 0,
+            "carried": 0,
+            "error": str(error),
+        })
+    return 1
+
+
+def list_user_decks(client: DeckSource, source: str, username: str) -> Dict[str, float]:
+    """The user's deck ids, in listing order, mapped to their update time.
+
+    Raises ValueError when the deck site answers with anything but a listing,
+    such as `{"detail": "Request was throttled."}`, so that an error is never
+    taken for an account without decks.
+    """
+    response = client.getUserDecks()
+    # Moxfield lists decks under 'data', Archidekt (and local imports) under 'results'
+    if source.lower() == "moxfield":
+        key, id_field, updated_field = "data", "publicId", "lastUpdatedAtUtc"
+    else:
+        key, id_field, updated_field = "results", "id", "updatedAt"
+    decks = response.get(key) if isinstance(response, dict) else None
+    if not isinstance(decks, list):
+        detail = response.get("detail", response) if isinstance(response, dict) else response
+        raise ValueError(f"Could not list the decks of {username} on {source}: {detail}")
+    return {str(j[id_field]): parse_timestamp(j.get(updated_field)) for j in decks}
+
+
+def prune_allowed(what: str, known: int, listed: int) -> bool:
+    """Whether a listing of `listed` decks may prune `what` holding `known` decks.
+
+    An empty listing, or one with less than half of the decks seen before, is
+    more likely a deck site hiccup than mass deletion, so it is only trusted
+    with --force_prune.
+    """
+    if FLAGS.force_prune or not known or listed and listed >= known / 2:
+        return True
+    logging.warning(
+        f"Not pruning the {what}: the deck site listed {listed} deck(s) where {known} were synced before. "
+        "Pass --force_prune if they were really deleted"
+    )
+    return False
+
+
+def open_index() -> Optional[CardIndex]:
+    if not FLAGS.index or FLAGS.dryrun:
+        return None
+    return CardIndex(Path(FLAGS.index).expanduser())
+
+
+def open_prefetcher() -> Optional[ImagePrefetcher]:
+    if not FLAGS.prefetch_images or FLAGS.dryrun:
+        return None
+    return ImagePrefetcher(
+        Path(FLAGS.pics_path).expanduser(),
+        base_url=FLAGS.image_base_url,
+        workers=FLAGS.image_workers,
+        rate=FLAGS.image_rate,
+        retries=FLAGS.image_retries,
+    )
+
+
+def finish_prefetch(prefetcher: ImagePrefetcher, ndjson=False):
+    pending = prefetcher.pending()
+    if pending:
+        logging.info(f"Waiting for {pending} card image download(s)..")
+    stats = prefetcher.close()
+    if ndjson:
+        write_ndjson({"event": "images", **stats})
+    logging.info(
+        f"Card images: {stats['downloaded']} downloaded, {stats['cached']} already cached, "
+        f"{stats['failed']} failed, {stats['unresolved']} without a set code"
+    )
+
+
+def open_profiler() -> Optional[MemoryProfiler]:
+    if not FLAGS.profile_memory and not FLAGS.memory_budget_mb:
+        return None
+    profiler = MemoryProfiler(budget_mb=FLAGS.memory_budget_mb)
+    profiler.start()
+    return profiler
+
+
+def finish_profiler(profiler: MemoryProfiler, ndjson=False) -> int:
+    """Report the memory profile. Returns the exit status for the budget."""
+    stats = profiler.stop()
+    if ndjson:
+        write_ndjson({"event": "memory", **stats})
+    MemoryProfiler.log_summary(stats)
+    if profiler.over_budget():
+        logging.error(
+            f"Peak memory {stats['peak'] / 2**20:.2f} MB exceeds the budget of {FLAGS.memory_budget_mb:g} MB"
+        )
+        return 1
+    return 0
+
+
+def run_worker(queue: WorkQueue, trice_path: Path):
+    """Lease, sync and acknowledge decks from `queue` until it is drained."""
+    worker = FLAGS.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    logging.info(f"Worker {worker} processing {queue.counts()['pending']} pending deck(s)")
+    ndjson = FLAGS.output == "ndjson"
+    index = open_index()
+    prefetcher = open_prefetcher()
+    profiler = open_profiler()
+    clients = {}
+    synced = failed = 0
+    budget = Budget(FLAGS.time_budget, FLAGS.max_requests)
+    with nullcontext() if ndjson else redirect_to_tqdm(tqdm):
+        progress = tqdm(desc=f"Worker {worker}", unit="deck", disable=ndjson)
+        while True:
+            # Unleased decks simply stay queued for the next worker
+            spent = budget.exhausted()
+            if spent:
+                logging.info(f"Worker {worker} stopping after its {spent}")
+                break
+            lease = queue.lease(worker, FLAGS.visibility_timeout, max_attempts=FLAGS.max_attempts)
+            if lease is None:
+                counts = queue.counts()
+                # Decks leased by other workers may still come back if they die
+                if not counts["pending"] and not counts["leased"]:
+                    break
+                time.sleep(FLAGS.poll_interval)
+                continue
+
+            key = (lease.source, lease.username)
+            if key not in clients:
+                clients[key] = create_deck_source(*key)
+            # No manifest here, several hosts may share the deck directory
+            layout = Layout(FLAGS.layout, source=lease.source, username=lease.username)
+            result = sync_deck(clients[key], lease.deck_id, trice_path, layout=layout)
+            budget.spend()
+            if profiler is not None:
+                profiler.add(result)
+            if result.ok:
+                synced += 1
+                if not queue.ack(lease, path=result.path):
+                    logging.warning(f"Lease on <{lease.deck_id}> expired before it was acknowledged")
+                if index is not None:
+                    index.update(result.deck_id, result.decklist, source=lease.source, username=lease.username)
+                if prefetcher is not None:
+                    prefetcher.add(result.decklist)
+            else:
+                failed += 1
+                queue.fail(lease, result.error, max_attempts=FLAGS.max_attempts)
+            if ndjson:
+                write_ndjson({**result.to_event(), "source": lease.source, "attempt": lease.attempts})
+            progress.update()
+        progress.close()
+
+    if index is not None:
+        index.close()
+    if prefetcher is not None:
+        finish_prefetch(prefetcher, ndjson)
+    counts = queue.counts()
+    if ndjson:
+        write_ndjson({"event": "summary", "worker": worker, "synced": synced, "failed": failed, "queue": counts})
+    logging.info(
+        f"Worker {worker} synced {synced} deck(s), {failed} attempt(s) failed. "
+        f"Queue: {counts['done']} done, {counts['failed']} failed"
+    )
+    queue.close()
+    if profiler is not None:
+        return finish_profiler(profiler, ndjson)
+
+
 def main(agrv):
     if FLAGS.version:
         return print(__version__)
@@ -122,8 +414,36 @@ def main(agrv):
         configure_interactive()
         return
 
+    # Index queries answer from disk and never touch the deck sources
+    if FLAGS.find_card or FLAGS.card_totals:
+        if not FLAGS.index or not Path(FLAGS.index).expanduser().exists():
+            logging.error("No card index found, sync some decks first")
+            return
+        with CardIndex(Path(FLAGS.index).expanduser()) as index:
+            return query_index(index, ndjson=FLAGS.output == "ndjson")
+
+    if (FLAGS.worker or FLAGS.enqueue) and not FLAGS.queue:
+        logging.error("--worker and --enqueue require --queue")
+        return
+
+    # A dry run would acknowledge decks it never wrote, completing them for good
+    if FLAGS.worker and FLAGS.dryrun:
+        logging.error("--worker cannot be combined with --dryrun")
+        return 1
+
+    # Workers take source and user from the queued jobs
+    if FLAGS.worker and not FLAGS.enqueue:
+        return run_worker(create_work_queue(FLAGS.queue), Path(FLAGS.deckpath))
+
+    # Local imports never touch the network nor the config file
+    if FLAGS.import_path:
+        source = "local"
+        username = str(Path(FLAGS.import_path).expanduser().resolve())
+        config_decks = []
+        config_fetch_all = True
+        config_deckpath = ""
     # Handle no_config mode
-    if FLAGS.no_config:
+    elif FLAGS.no_config:
         if not FLAGS.source or not FLAGS.username:
             logging.error("--no_config requires both --source and --username to be specified")
             return
@@ -141,35 +461,59 @@ def main(agrv):
         config_fetch_all = config.fetch_all
         config_deckpath = config.deckpath
 
+    # Repeated fetches of the same deck within the window share one request
+    deck_cache.configure(ttl=FLAGS.memo_ttl, maxsize=FLAGS.memo_size)
+    budget = Budget(FLAGS.time_budget, FLAGS.max_requests)
+
     # Create the appropriate deck source client using factory
     client = create_deck_source(source, username)
     logging.info(f"Using deck source: {source}")
 
+    journal = SyncJournal(journal_path(Path(FLAGS.journal).expanduser(), source, username))
+    previous = journal.load()
+    resume_state = previous if FLAGS.resume else None
+    if FLAGS.resume and resume_state is None:
+        logging.warning(f"No sync to resume in {journal.path}, starting a new one")
+
     # Determine if we should fetch all decks or use specific deck list
     fetch_all_mode = FLAGS.all_decks or config_fetch_all
 
     deck_ids = []
-
+    updated = {}
+    listed_all = False
+
+    # Resume the planned deck list of the last run, skipping decks already done
+    if resume_state is not None:
+        deck_ids = resume_state.pending()
+        logging.info(
+            f"Resuming sync: {len(resume_state.done)} deck(s) done, {len(deck_ids)} remaining"
+        )
     # If we have specific decks in config and not in fetch_all mode, use only those
-    if config_decks and not fetch_all_mode and not FLAGS.no_config:
+    elif config_decks and not fetch_all_mode and not FLAGS.no_config:
         deck_ids = config_decks
         logging.info(f"Using {len(deck_ids)} deck(s) from config file")
     # Otherwise, fetch all decks from the user
     elif username:
         logging.info(f"Getting all decks for user {username}..")
-        user_decks_response = client.getUserDecks()
-
-        # Handle different response formats from different sources
-        if source.lower() == "moxfield":
-            deck_ids = [j["publicId"] for j in user_decks_response["data"]]
-        elif source.lower() == "archidekt":
-            # Archidekt returns deck objects directly in 'results'
-            deck_ids = [str(j["id"]) for j in user_decks_response.get("results", [])]
-
+        try:
+            updated = list_user_decks(client, source, username)
+        except ValueError as e:
+            return abort_sync(source, username, e)
+        budget.spend()
+        deck_ids = list(updated)
         logging.info(f"Found {len(deck_ids)} deck(s) for user {username}")
+        listed_all = True
+
+    # Recently edited decks first, so a tight budget is spent where it matters
+    deck_ids = prioritize(
+        [str(deck_id) for deck_id in deck_ids],
+        updated,
+        pinned=config_decks,
+        carried=previous.carried if previous is not None else (),
+    )
 
     # Save/update config file if not in no_config mode
-    if not FLAGS.no_config:
+    if not FLAGS.no_config and not FLAGS.import_path:
         config_fp = Path.home() / ".deck2trice.yml"
 
         # If config doesn't exist, or if user provided CLI flags, save/update it
@@ -208,18 +552,122 @@ def main(agrv):
     if deckpath:
         logging.info(f"Saving decks to: {deckpath}")
 
-    jsonGets = []
-    with redirect_to_tqdm(tqdm):
-        for deck in tqdm(deck_ids, desc=f"Getting data from {source}"):
-            logging.debug(f"Grabbing decklist <{deck}>")
-            jsonGet = client.getDecklist(deck)
-            jsonGets.append(jsonGet)
-            # time.sleep(0.5)
-
-        if not FLAGS.dryrun:
-            for jsonGet in tqdm(jsonGets, desc="Converting deck to trice"):
-                decklist = client.parse_deck(jsonGet)
-                decklist.to_trice(Path(deckpath) if deckpath else Path(FLAGS.deckpath))
+    trice_path = Path(deckpath) if deckpath else Path(FLAGS.deckpath)
+
+    if FLAGS.enqueue:
+        queue = create_work_queue(FLAGS.queue)
+        added = queue.enqueue(source, username, deck_ids)
+        logging.info(f"Queued {added} of {len(deck_ids)} deck(s) in {FLAGS.queue}")
+        if FLAGS.worker:
+            return run_worker(queue, trice_path)
+        return queue.close()
+
+    if not FLAGS.dryrun:
+        try:
+            journal.start(source, username, deck_ids, resume=resume_state is not None)
+        except RuntimeError as e:
+            return abort_sync(source, username, e)
+
+    index = open_index()
+    if index is not None:
+        # A complete listing of the user's decks tells us which ones were deleted
+        if listed_all and prune_allowed("card index", len(index.deck_ids(source, username)), len(deck_ids)):
+            for deck_id in index.prune(source, username, deck_ids):
+                logging.info(f"Removed deleted deck <{deck_id}> from the card index")
+
+    # The manifest maps deck ids to their files, to follow renames and deletions
+    layout = Layout(FLAGS.layout, source=source, username=username)
+    manifest = None if FLAGS.dryrun else Manifest(trice_path)
+    if manifest is not None and listed_all and FLAGS.prune_deleted:
+        known = manifest.deck_ids(source, username)
+        if prune_allowed("deck directory", len(known), len(deck_ids)):
+            manifest.prune(source, username, deck_ids)
+
+    prefetcher = open_prefetcher()
+    profiler = open_profiler()
+
+    # In ndjson mode stdout carries only events, logs stay on stderr
+    ndjson = FLAGS.output == "ndjson"
+    failures = []
+    processed = 0
+    spent = None
+    sync_start = time.perf_counter()
+    with nullcontext() if ndjson else redirect_to_tqdm(tqdm):
+        try:
+            jobs = (FLAGS.jobs or os.cpu_count() or 1) if source == "local" else 1
+            if profiler is not None and jobs > 1:
+                # tracemalloc only sees this process
+                logging.info("Memory profiling converts local decks in a single process")
+                jobs = 1
+            # Stops starting decks once the budget is spent, including by the listing
+            results = sync_decks(
+                client, deck_ids, trice_path, dryrun=FLAGS.dryrun, jobs=jobs, layout=layout, budget=budget
+            )
+            for result in tqdm(results, total=len(deck_ids), desc=f"Syncing decks from {source}", disable=ndjson):
+                if profiler is not None:
+                    profiler.add(result)
+                if not result.ok:
+                    failures.append(result)
+                else:
+                    if manifest is not None:
+                        manifest.record(result.deck_id, result.path, name=result.name, source=source, username=username)
+                    if index is not None:
+                        index.update(result.deck_id, result.decklist, source=source, username=username)
+                    if prefetcher is not None:
+                        prefetcher.add(result.decklist)
+                if ndjson:
+                    write_ndjson(result.to_event())
+                if not FLAGS.dryrun:
+                    journal.record(
+                        result.deck_id,
+                        result.status,
+                        name=result.name,
+                        path=result.path,
+                        stage=result.stage,
+                        error=result.error,
+                    )
+                processed += 1
+                budget.spend()
+            spent = budget.exhausted()
+        except KeyboardInterrupt:
+            journal.close()
+            if manifest is not None:
+                manifest.save()
+            logging.warning("Sync interrupted, run again with --resume to continue")
+            raise
+
+    if manifest is not None:
+        manifest.save()
+    if index is not None:
+        index.close()
+    if prefetcher is not None:
+        finish_prefetch(prefetcher, ndjson)
+    carried = deck_ids[processed:]
+    if not FLAGS.dryrun:
+        journal.finish(failed=len(failures), carried=carried)
+    if ndjson:
+        write_ndjson({
+            "event": "summary",
+            "source": source,
+            "username": username,
+            "total": len(deck_ids),
+            "failed": len(failures),
+            "carried": len(carried),
+            "seconds": round(time.perf_counter() - sync_start, 6),
+        })
+
+    logging.info(f"Synced {processed - len(failures)}/{len(deck_ids)} deck(s)")
+    if carried:
+        logging.info(f"Stopped after the {spent}, {len(carried)} deck(s) carried over to the next run")
+    if failures:
+        logging.warning(f"{len(failures)} deck(s) failed:")
+        for result in failures:
+            label = f"{result.name} <{result.deck_id}>" if result.name else f"<{result.deck_id}>"
+            logging.warning(f"  {label} at {result.stage}: {result.error}")
+        logging.warning("Run again with --resume to retry only the failed decks")
+
+    if profiler is not None:
+        return finish_profiler(profiler, ndjson)
 
 
 def absl_main():
@@ -0,0 +1,90 @@
+from collections import defaultdict
+import tracemalloc
+from typing import *
+
+from absl import logging
+
+from .sync import SyncResult
+
+MB = 1024 * 1024
+
+
+class MemoryProfiler:
+    """Opt-in tracemalloc profiling of the sync path.
+
+    While started, sync_deck records for each stage (fetch, parse, write) the
+    bytes it allocated at its peak and still holds at its end. The profiler
+    aggregates those per stage across decks and tracks the peak traced memory of
+    the whole run, which can be checked against a budget.
+    """
+
+    def __init__(self, budget_mb: float = 0):
+        self.budget = int(budget_mb * MB)
+        self.peak = 0
+        self.decks = 0
+        self._started = False
+        self._stages: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"max_peak": 0, "total_peak": 0, "max_retained": 0, "count": 0}
+        )
+
+    def start(self):
+        # Tracing started by someone else (e.g. `-X tracemalloc`) is left running
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+
+    def add(self, result: SyncResult):
+        """Fold the memory recorded for one deck into the run statistics."""
+        self.decks += 1
+        self.peak = max(
+            self.peak,
+            result.memory_peak,
+            result.memory_between,
+            tracemalloc.get_traced_memory()[1],
+        )
+        for name, memory in result.memory.items():
+            stage = self._stages[name]
+            stage["max_peak"] = max(stage["max_peak"], memory["peak"])
+            stage["total_peak"] += memory["peak"]
+            stage["max_retained"] = max(stage["max_retained"], memory["retained"])
+            stage["count"] += 1
+
+    def stop(self) -> dict:
+        """Stop tracing (unless it was already on at `start`) and return the run statistics."""
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+        return {
+            "decks": self.decks,
+            "peak": self.peak,
+            "current": current,
+            "budget": self.budget,
+            "stages": {
+                name: {
+                    "max_peak": stage["max_peak"],
+                    "mean_peak": stage["total_peak"] // max(stage["count"], 1),
+                    "max_retained": stage["max_retained"],
+                }
+                for name, stage in self._stages.items()
+            },
+        }
+
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.peak > self.budget
+
+    @staticmethod
+    def log_summary(stats: dict):
+        logging.info(
+            f"Memory: peak {stats['peak'] / MB:.2f} MB over {stats['decks']} deck(s), "
+            f"{stats['current'] / MB:.2f} MB still allocated"
+        )
+        for name, stage in stats["stages"].items():
+            logging.info(
+                f"  {name}: peak {stage['max_peak'] / MB:.2f} MB max, "
+                f"{stage['mean_peak'] / MB:.2f} MB mean, "
+                f"retains up to {stage['max_retained'] / MB:.2f} MB"
+            )
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+import time
+from typing import *
+
+# Decks pinned in the config file go ahead of unpinned decks updated within the
+# same window (a UTC day), not merely of those with the exact same timestamp.
+PIN_WINDOW = 24 * 60 * 60
+
+
+def parse_timestamp(value) -> float:
+    """Epoch seconds of an API timestamp (ISO 8601 string or number), 0 if unknown."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def prioritize(
+    deck_ids: List[str],
+    updated: Optional[Dict[str, float]] = None,
+    pinned: Iterable[str] = (),
+    carried: Iterable[str] = (),
+) -> List[str]:
+    """Order deck ids so the most relevant work is done first.
+
+    Decks carried over from a run that ran out of budget come first, so nothing
+    starves across runs. Then the most recently updated decks by day, with decks
+    pinned in the config file ahead of others updated the same day (or with no
+    update time at all), and by exact update time within each tier. The original
+    order breaks any remaining tie.
+
+    Update times only come with a full listing of the user's decks, so a sync of
+    the config file's decks alone keeps their configured order.
+    """
+    updated = updated or {}
+    pinned = {str(deck_id) for deck_id in pinned}
+    carried = {str(deck_id) for deck_id in carried}
+    order = {}
+    for i, deck_id in enumerate(deck_ids):
+        order.setdefault(deck_id, i)
+
+    def key(deck_id):
+        timestamp = updated.get(deck_id, 0.0)
+        return (
+            deck_id not in carried,
+            -(timestamp // PIN_WINDOW),
+            deck_id not in pinned,
+            -timestamp,
+            order[deck_id],
+        )
+
+    return sorted(dict.fromkeys(deck_ids), key=key)
+
+
+class Budget:
+    """Wall-clock and request budget of a sync. 0 means unlimited."""
+
+    def __init__(self, seconds: float = 0, requests: int = 0):
+        self.seconds = seconds
+        self.requests = requests
+        self.spent_requests = 0
+        self.start = time.monotonic()
+
+    def spend(self, requests: int = 1):
+        self.spent_requests += requests
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def requests_left(self, reserved: int = 0) -> Optional[int]:
+        """Requests left after `reserved` ones, or None without a request budget."""
+        if not self.requests:
+            return None
+        return max(0, self.requests - self.spent_requests - reserved)
+
+    def exhausted(self) -> Optional[str]:
+        """Why the budget is spent, or None while there is some left."""
+        if self.seconds and self.elapsed >= self.seconds:
+            return f"time budget of {self.seconds:g}s"
+        if self.requests and self.spent_requests >= self.requests:
+            return f"budget of {self.requests} request(s)"
+        return None
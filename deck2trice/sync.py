@@ -0,0 +1,184 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+import tracemalloc
+from typing import *
+
+from absl import logging
+
+from .core import DeckList, DeckSource
+from .layout import Layout
+from .scheduler import Budget
+
+
+@dataclass
+class SyncResult:
+    """Outcome of syncing a single deck."""
+
+    deck_id: str
+    status: str  # "done", "fetched" (dryrun) or "failed"
+    name: str = ""
+    path: str = ""
+    stage: str = ""  # Stage that failed: "fetch", "parse" or "write"
+    error: str = ""
+    bytes: int = 0
+    timings: Dict[str, float] = field(default_factory=lambda: {})
+    # Only filled while tracemalloc is tracing, see profiling.MemoryProfiler
+    memory: Dict[str, Dict[str, int]] = field(default_factory=lambda: {})
+    memory_peak: int = 0
+    # Peak traced since the previous deck's last stage, i.e. what the caller
+    # allocated between decks, which the reset of the first stage would drop
+    memory_between: int = 0
+    decklist: Optional[DeckList] = None
+
+    @property
+    def ok(self):
+        return self.status != "failed"
+
+    def to_event(self) -> dict:
+        """JSON-serializable summary of the result, without the decklist."""
+        event = {
+            "event": "deck",
+            "id": self.deck_id,
+            "name": self.name,
+            "status": self.status,
+            "bytes": self.bytes,
+            "timings": {k: round(v, 6) for k, v in self.timings.items()},
+            "path": self.path,
+        }
+        if self.memory:
+            event["memory"] = {**self.memory, "peak": self.memory_peak}
+        if not self.ok:
+            event["stage"] = self.stage
+            event["error"] = self.error
+        return event
+
+
+@contextmanager
+def _stage(result: SyncResult, name: str):
+    """Mark `name` as the running stage of `result` and record its duration.
+
+    While tracemalloc is tracing, also record the bytes the stage allocated at
+    its peak and still holds at its end.
+    """
+    result.stage = name
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    yield
+    result.timings[name] = time.perf_counter() - start
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        result.memory[name] = {"peak": peak - before, "retained": current - before}
+        result.memory_peak = max(result.memory_peak, peak)
+
+
+def sync_deck(
+    client: DeckSource,
+    deck_id: str,
+    trice_path: Path,
+    dryrun=False,
+    layout: Optional[Layout] = None,
+) -> SyncResult:
+    """Fetch, parse and write one deck.
+
+    Any exception is caught and reported in the result, so one private, deleted
+    or malformed deck never aborts the rest of the sync.
+    """
+    result = SyncResult(str(deck_id), "failed")
+    if tracemalloc.is_tracing():
+        result.memory_between = tracemalloc.get_traced_memory()[1]
+    start = time.perf_counter()
+    try:
+        with _stage(result, "fetch"):
+            logging.debug(f"Grabbing decklist <{result.deck_id}>")
+            json_data = client.getDecklist(result.deck_id)
+
+        with _stage(result, "parse"):
+            decklist = client.parse_deck(json_data)
+            result.name = decklist.name
+
+        if not dryrun:
+            with _stage(result, "write"):
+                filename = layout.relpath(result.deck_id, decklist) if layout else None
+                fp = decklist.to_trice(trice_path, filename=filename)
+                result.path = str(fp)
+                result.bytes = Path(fp).stat().st_size
+
+        result.status = "fetched" if dryrun else "done"
+        result.stage = ""
+        result.decklist = decklist
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        logging.warning(f"Failed to {result.stage} deck <{result.deck_id}>: {result.error}")
+    result.timings["total"] = time.perf_counter() - start
+    return result
+
+
+def _sync_chunk(client: DeckSource, deck_ids: List[str], trice_path: Path, dryrun, layout) -> List[SyncResult]:
+    return [sync_deck(client, deck_id, trice_path, dryrun=dryrun, layout=layout) for deck_id in deck_ids]
+
+
+def sync_decks(
+    client: DeckSource,
+    deck_ids: List[str],
+    trice_path: Path,
+    dryrun=False,
+    jobs=1,
+    layout: Optional[Layout] = None,
+    budget: Optional[Budget] = None,
+) -> Iterator[SyncResult]:
+    """Sync `deck_ids` in order, yielding each result as soon as it is ready.
+
+    With `jobs` > 1 decks are spread over a pool of processes, which only makes
+    sense for sources bound by disk and CPU such as LocalFiles; network sources
+    are kept sequential to stay within the sites' rate limits.
+
+    No deck is started once `budget` is spent. The caller spends it for each
+    result it consumes. The pool only has a small window of decks in flight,
+    never more than the requests left, and every deck started is yielded, so
+    a spent budget leaves no deck written behind the caller's back.
+    """
+    if jobs <= 1 or len(deck_ids) <= 1:
+        for deck_id in deck_ids:
+            if budget is not None and budget.exhausted():
+                return
+            yield sync_deck(client, deck_id, trice_path, dryrun=dryrun, layout=layout)
+        return
+
+    # Chunks amortize the inter-process overhead over many small files, and a
+    # couple of chunks per process keeps every process busy
+    chunksize = max(1, min(32, len(deck_ids) // (jobs * 4)))
+    window = jobs * 2
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    pending = deque()
+    next_deck = in_flight = 0
+    try:
+        while True:
+            while len(pending) < window and next_deck < len(deck_ids):
+                size = min(chunksize, len(deck_ids) - next_deck)
+                if budget is not None:
+                    if budget.exhausted():
+                        break
+                    left = budget.requests_left(reserved=in_flight)
+                    if left is not None:
+                        size = min(size, left)
+                    if size <= 0:
+                        break
+                chunk = deck_ids[next_deck:next_deck + size]
+                pending.append(executor.submit(_sync_chunk, client, chunk, trice_path, dryrun, layout))
+                next_deck += size
+                in_flight += size
+            if not pending:
+                return
+            for result in pending.popleft().result():
+                in_flight -= 1
+                yield result
+    finally:
+        # Closing the generator early (interrupted) drops the decks not started
+        executor.shutdown(cancel_futures=True)
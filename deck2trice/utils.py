@@ -2,6 +2,8 @@
 from tqdm import tqdm
 from absl import logging
 import inspect
+import json
+import sys
 from contextlib import contextmanager
 from pathlib import Path
 
@@ -73,6 +75,13 @@ def redirect_to_tqdm(tqdm_class=tqdm):
         yield (a, b)
 
 
+def write_ndjson(record: dict, stream=None):
+    """Write `record` as one JSON line and flush, so consumers see it immediately."""
+    stream = sys.stdout if stream is None else stream
+    stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    stream.flush()
+
+
 def _pretty_print(current, parent=None, index=-1, depth=0):
     for i, node in enumerate(current):
         _pretty_print(node, current, i, depth + 1)
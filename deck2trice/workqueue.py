@@ -0,0 +1,306 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import *
+import uuid
+
+
+@dataclass
+class Lease:
+    """A deck handed to one worker until `expires` (a time.time() timestamp)."""
+
+    source: str
+    username: str
+    deck_id: str
+    attempts: int
+    token: str
+    expires: float
+
+
+class WorkQueue(ABC):
+    """Abstract base class for the deck work queues shared by sync workers.
+
+    Jobs are keyed by (source, deck_id), so enqueueing a deck that is already
+    pending or leased never creates duplicate work. Jobs are leased least
+    recently updated first, so a job released by `fail` goes behind the jobs
+    already waiting. A leased job that is not acknowledged before its
+    visibility timeout runs out is handed to another worker, unless it already used up its attempts (e.g. a deck that crashes
+    every worker leasing it), in which case it is marked failed.
+    """
+
+    @abstractmethod
+    def enqueue(self, source: str, username: str, deck_ids: Iterable[str]) -> int:
+        """Add decks to the queue. Returns the number of jobs (re)queued."""
+        pass
+
+    @abstractmethod
+    def lease(self, worker: str, visibility_timeout: float, max_attempts: int = 3) -> Optional[Lease]:
+        """Take the next available job, or None if nothing can be leased now.
+
+        Expired leases of jobs leased `max_attempts` times are marked failed
+        instead of being handed out again.
+        """
+        pass
+
+    @abstractmethod
+    def ack(self, lease: Lease, path: str = "") -> bool:
+        """Mark a leased job done. False if the lease had already expired."""
+        pass
+
+    @abstractmethod
+    def fail(self, lease: Lease, error: str, max_attempts: int = 3) -> bool:
+        """Release a leased job for retry, or mark it failed after `max_attempts`."""
+        pass
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status: pending, leased, done and failed."""
+        pass
+
+    def close(self):
+        pass
+
+
+def _expired_error(attempts: int) -> str:
+    return f"Lease expired without acknowledgement after {attempts} attempt(s)"
+
+
+@dataclass
+class _Job:
+    source: str
+    username: str
+    deck_id: str
+    status: str = "pending"
+    attempts: int = 0
+    token: str = ""
+    expires: float = 0.0
+    error: str = ""
+    path: str = ""
+    updated: float = 0.0
+    order: int = 0
+
+
+class LocalWorkQueue(WorkQueue):
+    """In-process stand-in for a shared queue, for threads of a single worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[Tuple[str, str], _Job] = {}
+        self._enqueued = 0
+
+    def enqueue(self, source, username, deck_ids):
+        added = 0
+        now = time.time()
+        with self._lock:
+            for deck_id in deck_ids:
+                key = (source, str(deck_id))
+                job = self._jobs.get(key)
+                if job is None or job.status in ("done", "failed"):
+                    # Ties are broken like the SQLite rowid, kept across re-enqueues
+                    if job is None:
+                        order = self._enqueued
+                        self._enqueued += 1
+                    else:
+                        order = job.order
+                    self._jobs[key] = _Job(source, username, str(deck_id), updated=now, order=order)
+                    added += 1
+        return added
+
+    def lease(self, worker, visibility_timeout, max_attempts=3):
+        now = time.time()
+        with self._lock:
+            available = []
+            for job in self._jobs.values():
+                expired = job.status == "leased" and job.expires < now
+                if expired and job.attempts >= max_attempts:
+                    job.status, job.error = "failed", _expired_error(job.attempts)
+                    job.updated = now
+                elif job.status == "pending" or expired:
+                    available.append(job)
+            if not available:
+                return None
+            job = min(available, key=lambda job: (job.updated, job.order))
+            job.status = "leased"
+            job.attempts += 1
+            job.token = uuid.uuid4().hex
+            job.expires = now + visibility_timeout
+            job.updated = now
+            return Lease(job.source, job.username, job.deck_id, job.attempts, job.token, job.expires)
+
+    def _held(self, lease):
+        job = self._jobs.get((lease.source, lease.deck_id))
+        if job is None or job.status != "leased" or job.token != lease.token:
+            return None
+        return job
+
+    def ack(self, lease, path=""):
+        now = time.time()
+        with self._lock:
+            job = self._held(lease)
+            if job is None or job.expires < now:
+                return False
+            job.status, job.path, job.error, job.updated = "done", path, "", now
+            return True
+
+    def fail(self, lease, error, max_attempts=3):
+        with self._lock:
+            job = self._held(lease)
+            if job is None:
+                return False
+            job.status = "failed" if job.attempts >= max_attempts else "pending"
+            job.error, job.updated = error, time.time()
+            return True
+
+    def counts(self):
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in a SQLite file, shareable by processes on one or more hosts.
+
+    Leases are taken in `BEGIN IMMEDIATE` transactions, so two workers never get
+    the same job. The rollback journal is used rather than WAL because WAL does
+    not work over network filesystems.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                source TEXT NOT NULL,
+                deck_id TEXT NOT NULL,
+                username TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                token TEXT NOT NULL DEFAULT '',
+                worker TEXT NOT NULL DEFAULT '',
+                expires REAL NOT NULL DEFAULT 0,
+                error TEXT NOT NULL DEFAULT '',
+                path TEXT NOT NULL DEFAULT '',
+                updated REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, deck_id)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs(status, expires)")
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def enqueue(self, source, username, deck_ids):
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT INTO jobs (source, deck_id, username, updated) VALUES (?, ?, ?, ?)
+                ON CONFLICT (source, deck_id) DO UPDATE SET
+                    status = 'pending', attempts = 0, token = '', worker = '',
+                    error = '', username = excluded.username, updated = excluded.updated
+                WHERE status IN ('done', 'failed')
+                """,
+                [(source, str(deck_id), username, now) for deck_id in deck_ids],
+            )
+            return conn.total_changes - before
+
+    def lease(self, worker, visibility_timeout, max_attempts=3):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', error = ?, updated = ?
+                WHERE status = 'leased' AND expires < ? AND attempts >= ?
+                """,
+                (_expired_error(max_attempts), now, now, max_attempts),
+            )
+            row = conn.execute(
+                """
+                SELECT source, username, deck_id, attempts FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND expires < ?)
+                ORDER BY updated, rowid LIMIT 1
+                """,
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            source, username, deck_id, attempts = row
+            lease = Lease(source, username, deck_id, attempts + 1, uuid.uuid4().hex, now + visibility_timeout)
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'leased', attempts = ?, token = ?, worker = ?,
+                    expires = ?, updated = ?
+                WHERE source = ? AND deck_id = ?
+                """,
+                (lease.attempts, lease.token, worker, lease.expires, now, source, deck_id),
+            )
+            return lease
+
+    def ack(self, lease, path=""):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = 'done', path = ?, error = '', updated = ?
+                WHERE source = ? AND deck_id = ? AND status = 'leased' AND token = ?
+                    AND expires >= ?
+                """,
+                (path, now, lease.source, lease.deck_id, lease.token, now),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, lease, error, max_attempts=3):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    error = ?, updated = ?
+                WHERE source = ? AND deck_id = ? AND status = 'leased' AND token = ?
+                """,
+                (max_attempts, error, time.time(), lease.source, lease.deck_id, lease.token),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self):
+        counts = dict.fromkeys(("pending", "leased", "done", "failed"), 0)
+        for status, n in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = n
+        return counts
+
+
+def create_work_queue(spec: str) -> WorkQueue:
+    """Factory function to create a WorkQueue from a spec string.
+
+    Args:
+        spec: 'memory' for an in-process queue, otherwise the path of a SQLite
+            queue file (optionally prefixed with 'sqlite:')
+
+    Returns:
+        A WorkQueue instance (LocalWorkQueue or SQLiteWorkQueue)
+    """
+    if spec == "memory":
+        return LocalWorkQueue()
+    if spec.startswith("sqlite:"):
+        spec = spec[len("sqlite:"):]
+    return SQLiteWorkQueue(Path(spec).expanduser())
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+
+import pytest
+
+from deck2trice.cache import coalesced, deck_cache
+from deck2trice.core import LocalFiles
+
+DECKLIST = """Commander
+1 Atraxa, Praetors' Voice (2X2) 190
+
+Deck
+1 Sol Ring (C21) 263
+1 Arcane Signet (C21) 236
+1 Command Tower (C21) 281
+{islands} Island
+
+Sideboard
+1 Swords to Plowshares (C21) 98
+"""
+
+
+@dataclass
+class FakeSite(LocalFiles):
+    """Local decks fetched like a deck site: through the memo, with large payloads.
+
+    Deck site responses carry much more than the cards (prices, rulings, ...),
+    which `payload_kb` of filler per deck stands for.
+    """
+
+    payload_kb: int = 250
+
+    @coalesced()
+    def getDecklist(self, deck_id: str):
+        data = super().getDecklist(deck_id)
+        data["extra"] = [
+            {"id": f"{deck_id}/{i}", "text": "x" * 240 + str(i)} for i in range(self.payload_kb * 4)
+        ]
+        return data
+
+
+@pytest.fixture(autouse=True)
+def clear_deck_cache():
+    deck_cache.clear()
+    yield
+    deck_cache.clear()
+
+
+@pytest.fixture
+def make_decks(tmp_path):
+    """Write `n` text deck exports and return their directory."""
+
+    def make(n, name="decks"):
+        root = tmp_path / name
+        root.mkdir()
+        for i in range(n):
+            (root / f"deck{i:04d}.txt").write_text(DECKLIST.format(islands=i % 30 + 1), encoding="utf-8")
+        return root
+
+    return make
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch):
+    """Run the deck2trice CLI with `argv`, keeping its state files in tmp_path.
+
+    `client` replaces the deck source the CLI would create.
+    """
+    from absl import flags
+
+    from deck2trice import main
+
+    def run(*argv, client=None):
+        if client is not None:
+            monkeypatch.setattr(main, "create_deck_source", lambda source, username: client)
+        flags.FLAGS.unparse_flags()
+        flags.FLAGS([
+            "deck2trice",
+            f"--deckpath={tmp_path / 'out'}",
+            f"--journal={tmp_path / 'journal'}",
+            f"--index={tmp_path / 'index.sqlite'}",
+            *argv,
+        ])
+        return main.main([])
+
+    yield run
+    flags.FLAGS.unparse_flags()
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from conftest import FakeSite
+from deck2trice.cache import SingleFlight, coalesced
+from deck2trice.sync import sync_decks
+
+THREADS = 6
+
+
+class _Site:
+    """Counts calls to a slow deck fetch held back until `gate` is set."""
+
+    flight = SingleFlight(copy_results=True)
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.gate = threading.Event()
+
+    @coalesced(flight=flight)
+    def getDecklist(self, deck_id, full=True):
+        self.calls += 1
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"id": deck_id, "full": full, "cards": [{"name": "Sol Ring", "count": 1}]}
+
+
+@pytest.fixture
+def site():
+    _Site.flight.configure(ttl=300.0, maxsize=32)
+    _Site.flight.clear()
+    yield _Site
+    _Site.flight.clear()
+
+
+def _call_concurrently(client, release_after):
+    """Fetch one deck from THREADS threads, positionally and by keyword."""
+    calls = [
+        lambda: client.getDecklist("abc"),
+        lambda: client.getDecklist("abc", True),
+        lambda: client.getDecklist(deck_id="abc"),
+        lambda: client.getDecklist("abc", full=True),
+        lambda: client.getDecklist(full=True, deck_id="abc"),
+        lambda: client.getDecklist("abc"),
+    ]
+    outcomes = []
+
+    def call(fn):
+        try:
+            outcomes.append(fn())
+        except Exception as e:
+            outcomes.append(e)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        for fn in calls:
+            pool.submit(call, fn)
+        release_after()
+        client.gate.set()
+    return outcomes
+
+
+def _followers_joined(flight):
+    """Block until every other thread waits on the call in flight."""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with flight._lock:
+            if any(call.followers == THREADS - 1 for call in flight._inflight.values()):
+                return
+        time.sleep(0.001)
+    raise AssertionError("callers were not coalesced")
+
+
+def test_concurrent_calls_run_once(site):
+    site.flight.configure(ttl=0)
+    client = site()
+    results = _call_concurrently(client, lambda: _followers_joined(site.flight))
+    assert client.calls == 1
+    assert len(results) == THREADS
+    assert all(result == {"id": "abc", "full": True, "cards": [{"name": "Sol Ring", "count": 1}]} for result in results)
+
+
+def test_shared_results_are_independent_copies(site):
+    client = site()
+    client.gate.set()
+    results = _call_concurrently(client, lambda: None)
+    results.append(client.getDecklist("abc"))
+    assert client.calls == 1
+    assert len({id(result) for result in results}) == len(results)
+    assert len({id(result["cards"]) for result in results}) == len(results)
+    results[0]["cards"].clear()
+    assert client.getDecklist(deck_id="abc")["cards"] == [{"name": "Sol Ring", "count": 1}]
+
+
+def test_errors_are_not_memoized(site):
+    client = site(error=ConnectionError("throttled"))
+    client.gate.set()
+    with pytest.raises(ConnectionError):
+        client.getDecklist("abc")
+    client.error = None
+    assert client.getDecklist("abc")["id"] == "abc"
+    assert client.calls == 2
+
+
+def test_followers_receive_the_leaders_error(site):
+    site.flight.configure(ttl=0)
+    error = ConnectionError("throttled")
+    client = site(error=error)
+    outcomes = _call_concurrently(client, lambda: _followers_joined(site.flight))
+    assert client.calls == 1
+    assert outcomes == [error] * THREADS
+    # The failure is not memoized, the next call tries again
+    client.error = None
+    assert client.getDecklist("abc")["id"] == "abc"
+    assert client.calls == 2
+
+
+def _sync_peak(root, trice_path) -> int:
+    client = FakeSite(root=str(root))
+    deck_ids = [deck["id"] for deck in client.getUserDecks()["results"]]
+    tracemalloc.start()
+    try:
+        for result in sync_decks(client, deck_ids, trice_path):
+            assert result.ok, result.error
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_network_sync_peak_does_not_grow_with_deck_count(make_decks, tmp_path):
+    small = _sync_peak(make_decks(40, "small"), tmp_path / "small-out")
+    large = _sync_peak(make_decks(160, "large"), tmp_path / "large-out")
+    # The memo is bounded, so four times the decks must not hold four times the payloads
+    assert large < small * 1.5, f"{small / 2**20:.1f} MB for 40 decks, {large / 2**20:.1f} MB for 160"
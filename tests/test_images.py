@@ -0,0 +1,116 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from deck2trice.core import DeckList, MTGCard
+from deck2trice.images import ImagePrefetcher, RateLimiter, image_path
+
+
+class _ScryfallStub(BaseHTTPRequestHandler):
+    """Serves `/cards/<set>/<number>` images: 404 for set "nil", and 429 for
+    set "lim" until the same image was requested `throttle` times."""
+
+    throttle = 2
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self.server.requests[path] += 1
+        set_code = path.split("/")[2]
+        if set_code == "nil":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if set_code == "lim" and self.server.requests[path] <= self.throttle:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        body = f"image of {path}".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def scryfall():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ScryfallStub)
+    server.requests = Counter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _card(name, set_code="c21", number="1"):
+    return MTGCard(name=name, quantity=1, set_code=set_code, collector_number=number)
+
+
+def _prefetcher(tmp_path, server, **kwargs):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return ImagePrefetcher(tmp_path / "pics", base_url=base_url, workers=4, rate=0, backoff=0, **kwargs)
+
+
+def test_prefetch_dedups_across_decks_and_skips_cached_images(tmp_path, scryfall):
+    cached = _card("Island", number="2")
+    cached_path = image_path(cached, tmp_path / "pics")
+    cached_path.parent.mkdir(parents=True)
+    cached_path.write_bytes(b"already here")
+
+    prefetcher = _prefetcher(tmp_path, scryfall)
+    first = DeckList([_card("Sol Ring"), cached], commanders=[_card("Atraxa", number="3")])
+    second = DeckList([_card("Sol Ring"), _card("Plains", set_code="")])
+    prefetcher.add(first)
+    prefetcher.add(second)
+    stats = prefetcher.close()
+
+    assert stats["downloaded"] == 2
+    assert stats["cached"] == 1
+    assert stats["unresolved"] == 1
+    assert stats["failed"] == 0
+    assert scryfall.requests == {"/cards/c21/1": 1, "/cards/c21/3": 1}
+    assert image_path(_card("Sol Ring"), tmp_path / "pics").read_bytes() == b"image of /cards/c21/1"
+    assert cached_path.read_bytes() == b"already here"
+
+
+def test_prefetch_retries_rate_limited_requests(tmp_path, scryfall):
+    prefetcher = _prefetcher(tmp_path, scryfall, retries=3)
+    prefetcher.add_card(_card("Sol Ring", set_code="lim"))
+    stats = prefetcher.close()
+    assert (stats["downloaded"], stats["failed"]) == (1, 0)
+    assert scryfall.requests["/cards/lim/1"] == 3
+
+
+def test_prefetch_counts_failures(tmp_path, scryfall):
+    prefetcher = _prefetcher(tmp_path, scryfall, retries=1)
+    prefetcher.add_card(_card("Missing", set_code="nil"))
+    # Still throttled after its only retry
+    prefetcher.add_card(_card("Sol Ring", set_code="lim"))
+    prefetcher.add_card(_card("Arcane Signet"))
+    stats = prefetcher.close()
+    assert (stats["downloaded"], stats["failed"]) == (1, 2)
+    # Not found is not retried
+    assert scryfall.requests["/cards/nil/1"] == 1
+    assert scryfall.requests["/cards/lim/1"] == 2
+    assert not list((tmp_path / "pics").rglob("*.part"))
+
+
+def test_rate_limiter_spaces_out_calls_across_threads():
+    limiter = RateLimiter(rate=50)
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The first call goes right away, the other nine wait 20ms each in turn
+    assert time.monotonic() - start >= 9 * 0.02 * 0.9
@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+import json
+from typing import *
+
+import pytest
+
+from deck2trice.core import LocalFiles
+from deck2trice.journal import SyncJournal, journal_path
+
+
+@dataclass
+class Flaky(LocalFiles):
+    """Local decks that fail on the `broken` ids, or get interrupted after
+    fetching `interrupt_after` decks."""
+
+    broken: Set[str] = field(default_factory=set)
+    interrupt_after: int = -1
+    fetched: List[str] = field(default_factory=list)
+
+    def getDecklist(self, deck_id: str):
+        if len(self.fetched) == self.interrupt_after:
+            raise KeyboardInterrupt
+        self.fetched.append(deck_id)
+        if deck_id in self.broken:
+            raise ConnectionError(f"{deck_id} is unavailable")
+        return super().getDecklist(deck_id)
+
+
+def _journal(tmp_path, root):
+    return SyncJournal(journal_path(tmp_path / "journal", "local", str(root)))
+
+
+def test_replays_an_interrupted_run(tmp_path):
+    journal = SyncJournal(tmp_path / "run.journal")
+    journal.start("moxfield", "alice", ["a", "b", "c", "d"])
+    journal.record("a", "done", path="a.cod")
+    journal.record("b", "failed", error="timed out")
+    journal.record("c", "done", path="c.cod")
+    journal.close()
+
+    state = journal.load()
+    assert not state.finished
+    assert (state.source, state.username) == ("moxfield", "alice")
+    assert state.done == {"a": "a.cod", "c": "c.cod"}
+    assert state.failed == {"b": "timed out"}
+    assert state.pending() == ["b", "d"]
+
+
+def test_resumed_run_appends_and_clears_failures(tmp_path):
+    journal = SyncJournal(tmp_path / "run.journal")
+    journal.start("moxfield", "alice", ["a", "b"])
+    journal.record("a", "failed", error="timed out")
+    journal.close()
+
+    journal.start("moxfield", "alice", [], resume=True)
+    journal.record("a", "done", path="a.cod")
+    journal.finish(carried=[])
+    state = journal.load()
+    assert state.finished and state.failed == {}
+    assert state.deck_ids == ["a", "b"]
+    assert state.pending() == ["b"]
+
+    journal.start("moxfield", "alice", ["c"])
+    assert journal.load().deck_ids == ["c"]
+    journal.close()
+
+
+def test_ignores_a_torn_last_line(tmp_path):
+    journal = SyncJournal(tmp_path / "run.journal")
+    journal.start("moxfield", "alice", ["a", "b"])
+    journal.record("a", "done", path="a.cod")
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"event": "deck", "id": "b", "status": "done"})[:20])
+
+    state = journal.load()
+    assert state.done == {"a": "a.cod"}
+    assert state.pending() == ["b"]
+    assert SyncJournal(tmp_path / "missing.journal").load() is None
+
+
+def test_journal_is_locked_while_syncing(tmp_path):
+    path = journal_path(tmp_path, "moxfield", "alice")
+    assert path != journal_path(tmp_path, "moxfield", "bob")
+    running = SyncJournal(path)
+    running.start("moxfield", "alice", ["a"])
+    with pytest.raises(RuntimeError):
+        SyncJournal(path).start("moxfield", "alice", ["a"])
+    running.close()
+    SyncJournal(path).start("moxfield", "alice", ["a"])
+
+
+def test_resume_continues_an_interrupted_sync(make_decks, run_main, tmp_path):
+    root = make_decks(5)
+    args = (f"--import_path={root}", "--jobs=1")
+    with pytest.raises(KeyboardInterrupt):
+        run_main(*args, client=Flaky(root=str(root), interrupt_after=2))
+    state = _journal(tmp_path, root).load()
+    assert not state.finished
+    pending = state.pending()
+    assert len(state.done) == 2 and len(pending) == 3
+    assert sorted(pending + list(state.done)) == sorted(state.deck_ids)
+
+    client = Flaky(root=str(root))
+    run_main(*args, "--resume", client=client)
+    assert client.fetched == pending
+    assert _journal(tmp_path, root).load().finished
+    assert len(list((tmp_path / "out").glob("*.cod"))) == 5
+
+
+def test_resume_retries_only_failed_decks(make_decks, run_main, tmp_path):
+    root = make_decks(4)
+    args = (f"--import_path={root}", "--jobs=1")
+    run_main(*args, client=Flaky(root=str(root), broken={"deck0001.txt", "deck0003.txt"}))
+    state = _journal(tmp_path, root).load()
+    assert state.finished
+    assert sorted(state.failed) == ["deck0001.txt", "deck0003.txt"]
+
+    client = Flaky(root=str(root))
+    run_main(*args, "--resume", client=client)
+    assert sorted(client.fetched) == ["deck0001.txt", "deck0003.txt"]
+    state = _journal(tmp_path, root).load()
+    assert state.failed == {} and state.pending() == []
@@ -0,0 +1,192 @@
+import json
+
+import pytest
+
+from deck2trice.core import DeckList, LocalFiles
+from deck2trice.layout import MANIFEST_NAME, Layout, Manifest
+
+
+def _deck(name="Atraxa Counters", deck_format="commander", themes=()):
+    return DeckList([], name=name, format=deck_format, themes=list(themes))
+
+
+def _write(root, relpath, text="deck"):
+    fp = root / relpath
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    fp.write_text(text)
+    return fp
+
+
+def test_layout_paths():
+    deck = _deck(themes=["Counters"])
+    legacy = Layout("legacy", "moxfield", "alice")
+    assert legacy.relpath("abc", deck).as_posix() == "Atraxa Counters.cod"
+
+    flat = Layout("flat", "moxfield", "alice").relpath("abc", deck)
+    assert flat.parent.as_posix() == "."
+    assert flat.name.startswith("Atraxa Counters (") and flat.suffix == ".cod"
+    assert Layout("format", "moxfield", "alice").relpath("abc", deck).parent.as_posix() == "Commander"
+    assert Layout("themes", "moxfield", "alice").relpath("abc", deck).parent.as_posix() == "Counters"
+    assert Layout("themes", "moxfield", "alice").relpath("abc", _deck()).parent.as_posix() == "Untagged"
+    assert Layout("account", "moxfield", "alice").relpath("abc", deck).parent.as_posix() == "Moxfield/alice"
+    assert Layout("account", "local", "/exports/old").relpath("abc", deck).parent.as_posix() == "Local/old"
+
+    with pytest.raises(ValueError):
+        Layout("nested")
+
+
+def test_layout_names_are_unique_per_source_account_and_id():
+    deck = _deck()
+    names = {
+        Layout("flat", source, username).filename(deck_id, deck)
+        for source, username, deck_id in [
+            ("moxfield", "alice", "x.txt"),
+            ("moxfield", "bob", "x.txt"),
+            ("archidekt", "alice", "x.txt"),
+            ("local", "/a", "x.txt"),
+            ("local", "/b", "x.txt"),
+            ("local", "/a", "y.txt"),
+        ]
+    }
+    assert len(names) == 6
+    assert Layout("flat", "local", "/a").filename("x.txt", deck) == Layout("flat", "local", "/a").filename("x.txt", deck)
+
+
+def test_rename_replaces_the_previous_file(tmp_path):
+    manifest = Manifest(tmp_path)
+    old = _write(tmp_path, "Old Name.cod")
+    manifest.record("abc", old, name="Old Name", source="moxfield", username="alice")
+    new = _write(tmp_path, "New Name.cod")
+    manifest.record("abc", new, name="New Name", source="moxfield", username="alice")
+    assert not old.exists() and new.exists()
+    assert manifest.deck_ids("moxfield", "alice") == ["abc"]
+
+
+def test_layout_change_moves_files_and_drops_empty_directories(tmp_path):
+    manifest = Manifest(tmp_path)
+    first = _write(tmp_path, "Commander/Atraxa.cod")
+    second = _write(tmp_path, "Commander/Kenrith.cod")
+    manifest.record("a", first, source="moxfield", username="alice")
+    manifest.record("k", second, source="moxfield", username="alice")
+
+    manifest.record("a", _write(tmp_path, "Atraxa.cod"), source="moxfield", username="alice")
+    assert not first.exists()
+    assert (tmp_path / "Commander").is_dir()
+
+    manifest.record("k", _write(tmp_path, "Kenrith.cod"), source="moxfield", username="alice")
+    assert not (tmp_path / "Commander").exists()
+
+
+def test_moving_out_of_a_directory_keeps_files_not_recorded(tmp_path):
+    manifest = Manifest(tmp_path)
+    recorded = _write(tmp_path, "Commander/Atraxa.cod")
+    mine = _write(tmp_path, "Commander/My own deck.cod")
+    manifest.record("a", recorded, source="moxfield", username="alice")
+    manifest.record("a", _write(tmp_path, "Atraxa.cod"), source="moxfield", username="alice")
+    assert not recorded.exists() and mine.exists()
+
+
+def test_legacy_name_collision_keeps_the_file_of_the_last_writer(tmp_path):
+    manifest = Manifest(tmp_path)
+    shared = _write(tmp_path, "Burn.cod")
+    manifest.record("one", shared, source="moxfield", username="alice")
+    manifest.record("two", shared, source="moxfield", username="alice")
+    assert manifest.deck_ids("moxfield", "alice") == ["two"]
+
+    # Deck "one" is gone from the site, but the file now belongs to "two"
+    assert manifest.prune("moxfield", "alice", keep=["two"]) == []
+    assert shared.exists()
+    # Renaming "one" elsewhere later must not delete "two"'s file either
+    manifest.record("one", _write(tmp_path, "Burn 2.cod"), source="moxfield", username="alice")
+    assert shared.exists()
+
+
+def test_prune_only_removes_recorded_decks_of_the_account(tmp_path):
+    manifest = Manifest(tmp_path)
+    kept = _write(tmp_path, "Kept.cod")
+    deleted = _write(tmp_path, "Deleted.cod")
+    other = _write(tmp_path, "Bob.cod")
+    local = _write(tmp_path, "Local.cod")
+    mine = _write(tmp_path, "Hand made.cod")
+    manifest.record("k", kept, source="moxfield", username="alice")
+    manifest.record("d", deleted, source="moxfield", username="alice")
+    manifest.record("d", other, source="moxfield", username="bob")
+    manifest.record("d", local, source="local", username="/exports")
+
+    assert manifest.prune("moxfield", "alice", keep=["k"]) == ["d"]
+    assert not deleted.exists()
+    assert kept.exists() and other.exists() and local.exists() and mine.exists()
+    assert manifest.deck_ids("moxfield", "bob") == ["d"]
+
+
+def test_prune_never_leaves_the_deck_directory(tmp_path):
+    root = tmp_path / "decks"
+    outside = _write(tmp_path, "precious.txt")
+    root.mkdir()
+    (root / MANIFEST_NAME).write_text(json.dumps({
+        "version": 2,
+        "decks": {"moxfield:alice:x": {
+            "deck_id": "x", "path": "../precious.txt", "name": "", "source": "moxfield", "username": "alice",
+        }},
+    }))
+    Manifest(root).prune("moxfield", "alice", keep=[])
+    assert outside.exists()
+
+
+def test_manifest_persists_and_upgrades_version_1(tmp_path):
+    _write(tmp_path, "Atraxa.cod")
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({
+        "version": 1,
+        "decks": {"abc": {"path": "Atraxa.cod", "name": "Atraxa", "source": "moxfield", "username": "alice"}},
+    }))
+    manifest = Manifest(tmp_path)
+    assert manifest.deck_ids("moxfield", "alice") == ["abc"]
+    manifest.save()
+    data = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert data["version"] == 2
+    assert data["decks"]["moxfield:alice:abc"]["deck_id"] == "abc"
+
+    # Moving the deck after the upgrade still replaces its old file
+    Manifest(tmp_path).record("abc", _write(tmp_path, "Atraxa (1a2b3c4d).cod"), source="moxfield", username="alice")
+    assert not (tmp_path / "Atraxa.cod").exists()
+
+
+class _Throttled(LocalFiles):
+    def getUserDecks(self):
+        return {"detail": "Request was throttled."}
+
+
+def _synced(tmp_path):
+    return sorted(p.name for p in (tmp_path / "out").glob("*.cod"))
+
+
+def test_collapsed_listing_prunes_nothing_unless_forced(make_decks, run_main, tmp_path):
+    root = make_decks(4)
+    args = (f"--import_path={root}", "--layout=flat", "--jobs=1")
+    run_main(*args)
+    assert len(_synced(tmp_path)) == 4
+
+    for fp in sorted(root.glob("*.txt"))[1:]:
+        fp.unlink()
+    run_main(*args)
+    assert len(_synced(tmp_path)) == 4
+
+    run_main(*args, "--force_prune")
+    assert len(_synced(tmp_path)) == 1
+
+
+def test_small_deletions_are_pruned(make_decks, run_main, tmp_path):
+    root = make_decks(4)
+    args = (f"--import_path={root}", "--layout=flat", "--jobs=1")
+    run_main(*args)
+    sorted(root.glob("*.txt"))[0].unlink()
+    run_main(*args)
+    assert len(_synced(tmp_path)) == 3
+
+
+def test_listing_error_aborts_without_pruning(make_decks, run_main, tmp_path):
+    root = make_decks(4)
+    args = (f"--import_path={root}", "--layout=flat", "--jobs=1")
+    run_main(*args)
+    assert run_main(*args, "--force_prune", client=_Throttled(root=str(root))) == 1
+    assert len(_synced(tmp_path)) == 4
@@ -0,0 +1,148 @@
+import json
+from pathlib import Path
+
+from deck2trice.core import LocalFiles
+from deck2trice.sync import sync_decks
+
+EXPORTS = Path(__file__).parent / "exports"
+
+
+def _parse(deck_id):
+    client = LocalFiles(root=str(EXPORTS))
+    return client.parse_deck(client.getDecklist(deck_id))
+
+
+def _cards(zone):
+    return [(card.quantity, card.name, card.set_code, card.collector_number) for card in zone]
+
+
+def test_lists_supported_exports_in_a_stable_order(tmp_path):
+    (tmp_path / "b.txt").write_text("1 Sol Ring\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.json").write_text("{}")
+    (tmp_path / "notes.md").write_text("not a deck")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "c.txt").write_text("1 Sol Ring\n")
+    listing = LocalFiles(root=str(tmp_path)).getUserDecks()["results"]
+    assert [deck["id"] for deck in listing] == ["b.txt", "sub/a.json"]
+    assert all(deck["updatedAt"] > 0 for deck in listing)
+
+
+def test_moxfield_mtga_text_export():
+    deck = _parse("moxfield-mtga.txt")
+    assert deck.name == "moxfield-mtga"
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    assert _cards(deck.mainboard) == [
+        (1, "Arcane Signet", "C21", "236"),
+        (1, "Command Tower", "C21", "281"),
+        (1, "Sol Ring", "C21", "263"),
+        (5, "Forest", "ONE", "276"),
+    ]
+    assert _cards(deck.sideboard) == [(1, "Swords to Plowshares", "C21", "98")]
+
+
+def test_plain_text_export_blank_line_starts_the_sideboard():
+    deck = _parse("moxfield-plain.txt")
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "", ""), (1, "Arcane Signet", "", ""), (10, "Island", "", "")]
+    assert _cards(deck.sideboard) == [(1, "Negate", "", "")]
+
+
+def test_archidekt_text_export_uses_categories():
+    deck = _parse("archidekt.txt")
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "C21", "263"), (1, "Arcane Signet", "C21", "236")]
+    assert _cards(deck.maybeboard) == [(1, "Cyclonic Rift", "2XM", "51")]
+
+
+def test_unrecognized_text_lines_keep_the_current_zone():
+    deck = LocalFiles._parse_text(
+        "Name Grixis Tempo\n"
+        "Deck\n"
+        "4 Lightning Bolt\n"
+        "Side note: cut the burn later\n"
+        "4 Counterspell\n"
+        "Sideboard (2):\n"
+        "2 Negate\n"
+    )
+    assert deck.name == "Grixis Tempo"
+    assert _cards(deck.mainboard) == [(4, "Lightning Bolt", "", ""), (4, "Counterspell", "", "")]
+    assert _cards(deck.sideboard) == [(2, "Negate", "", "")]
+
+
+def test_text_section_headers():
+    deck = LocalFiles._parse_text(
+        "// Commander\n1 Atraxa, Praetors' Voice\n"
+        "COMPANION:\n1 Lurrus of the Dream-Den\n"
+        "# Maybeboard\n1 Cyclonic Rift\n"
+        "Tokens\n2 Zombie\n"
+    )
+    assert [card.name for card in deck.commanders] == ["Atraxa, Praetors' Voice"]
+    assert [card.name for card in deck.companions] == ["Lurrus of the Dream-Den"]
+    assert [card.name for card in deck.maybeboard] == ["Cyclonic Rift"]
+    assert [card.name for card in deck.tokens] == ["Zombie"]
+    assert deck.mainboard == []
+
+
+def test_moxfield_csv_export():
+    deck = _parse("moxfield.csv")
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "C21", "263"), (10, "Island", "ONE", "271")]
+    assert deck.sideboard == []
+
+
+def test_archidekt_csv_export():
+    deck = _parse("archidekt.csv")
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "C21", "263")]
+    assert _cards(deck.sideboard) == [(1, "Negate", "M20", "69")]
+    assert deck.mainboard[0].uuid == "77b4aa6b-6d9e-46cd-aea1-2b1e5c8ea1b8"
+
+
+def test_moxfield_v2_json_export():
+    deck = _parse("moxfield-v2.json")
+    assert (deck.name, deck.format, deck.themes) == ("Atraxa Counters", "commander", ["Counters"])
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    # Split and adventure cards keep both halves, other double-faced cards the front
+    assert [card.name for card in deck.mainboard] == [
+        "Sol Ring",
+        "Fire // Ice",
+        "Brazen Borrower // Petty Theft",
+        "Delver of Secrets",
+    ]
+    assert _cards(deck.sideboard) == [(1, "Swords to Plowshares", "C21", "98")]
+
+
+def test_moxfield_v3_json_export():
+    deck = _parse("moxfield-v3.json")
+    assert deck.name == "Atraxa Counters v3"
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "C21", "263"), (1, "Arcane Signet", "C21", "236")]
+    assert deck.sideboard == []
+
+
+def test_archidekt_json_export():
+    deck = _parse("archidekt.json")
+    assert (deck.name, deck.format, deck.themes) == ("Atraxa Superfriends", "commander", ["Superfriends"])
+    assert _cards(deck.commanders) == [(1, "Atraxa, Praetors' Voice", "2X2", "190")]
+    assert _cards(deck.mainboard) == [(1, "Sol Ring", "C21", "263")]
+    assert _cards(deck.maybeboard) == [(1, "Cyclonic Rift", "2XM", "51")]
+    assert _cards(deck.tokens) == [(2, "Zombie", "TC21", "12")]
+
+
+def test_unrecognized_json_export_fails_its_deck(tmp_path):
+    (tmp_path / "other.json").write_text(json.dumps({"hello": "world"}))
+    result = next(sync_decks(LocalFiles(root=str(tmp_path)), ["other.json"], tmp_path / "out"))
+    assert (result.status, result.stage) == ("failed", "parse")
+    assert "Unrecognized JSON deck export" in result.error
+
+
+def test_parallel_sync(make_decks, tmp_path):
+    root = make_decks(40)
+    client = LocalFiles(root=str(root))
+    deck_ids = [deck["id"] for deck in client.getUserDecks()["results"]]
+    results = list(sync_decks(client, deck_ids, tmp_path / "out", jobs=2))
+    # Results come back in order, with their decklists, from the worker processes
+    assert [result.deck_id for result in results] == deck_ids
+    assert all(result.ok and result.decklist is not None for result in results)
+    assert sorted(Path(result.path).name for result in results) == sorted(
+        p.name for p in (tmp_path / "out").glob("*.cod")
+    )
@@ -0,0 +1,83 @@
+import json
+import tracemalloc
+
+from conftest import DECKLIST, FakeSite
+from deck2trice.core import LocalFiles
+from deck2trice.profiling import MemoryProfiler
+from deck2trice.sync import sync_decks
+
+DECKS = 1000
+# Decks are synced one at a time and the memo is bounded, so the peak should not
+# grow with their number
+BUDGET_MB = 16
+
+
+def test_sync_stays_within_memory_budget(make_decks, run_main, capsys):
+    root = make_decks(DECKS)
+    # Through the deck sites' fetch path and memo, with the index, manifest and
+    # journal updated after each deck as in any sync
+    client = FakeSite(root=str(root), payload_kb=50)
+    status = run_main(
+        f"--import_path={root}",
+        "--layout=flat",
+        f"--memory_budget_mb={BUDGET_MB}",
+        "--output=ndjson",
+        client=client,
+    )
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    summary = next(e for e in events if e["event"] == "summary")
+    memory = next(e for e in events if e["event"] == "memory")
+    assert (summary["total"], summary["failed"]) == (DECKS, 0)
+    assert memory["decks"] == DECKS
+    assert set(memory["stages"]) == {"fetch", "parse", "write"}
+    assert status == 0, f"peak {memory['peak'] / 2**20:.2f} MB"
+
+
+def _deck(tmp_path) -> LocalFiles:
+    root = tmp_path / "decks"
+    root.mkdir()
+    (root / "deck.txt").write_text(DECKLIST.format(islands=1), encoding="utf-8")
+    return LocalFiles(root=str(root))
+
+
+def test_profilers_do_not_leak_peaks_into_each_other(tmp_path):
+    client = _deck(tmp_path)
+
+    first = MemoryProfiler()
+    first.start()
+    ballast = bytearray(20 * 2**20)
+    del ballast
+    first.add(next(sync_decks(client, ["deck.txt"], tmp_path / "out")))
+    assert first.stop()["peak"] >= 20 * 2**20
+
+    second = MemoryProfiler(budget_mb=5)
+    second.start()
+    second.add(next(sync_decks(client, ["deck.txt"], tmp_path / "out")))
+    second.stop()
+    assert not second.over_budget()
+
+
+def test_allocations_between_decks_count_towards_the_peak(tmp_path):
+    client = _deck(tmp_path)
+
+    profiler = MemoryProfiler(budget_mb=5)
+    profiler.start()
+    for _ in range(2):
+        profiler.add(next(sync_decks(client, ["deck.txt"], tmp_path / "out")))
+        # Freed before the next deck resets the peak for its first stage
+        ballast = bytearray(10 * 2**20)
+        del ballast
+    profiler.stop()
+    assert profiler.over_budget()
+
+
+def test_tracing_started_elsewhere_keeps_running():
+    tracemalloc.start()
+    try:
+        profiler = MemoryProfiler()
+        profiler.start()
+        profiler.stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
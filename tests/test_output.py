@@ -0,0 +1,59 @@
+import json
+
+from deck2trice.core import LocalFiles
+from deck2trice.journal import SyncJournal, journal_path
+
+
+def _events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+class _Throttled(LocalFiles):
+    def getUserDecks(self):
+        return {"detail": "Request was throttled."}
+
+
+def test_sync_events(make_decks, run_main, capsys):
+    root = make_decks(2)
+    assert not run_main(f"--import_path={root}", "--jobs=1", "--output=ndjson")
+    events = _events(capsys)
+    assert [event["event"] for event in events] == ["deck", "deck", "summary"]
+    assert events[-1]["total"] == 2 and events[-1]["failed"] == 0
+    assert "error" not in events[-1]
+
+
+def test_listing_error_is_reported_as_summary(make_decks, run_main, capsys):
+    root = make_decks(2)
+    status = run_main(f"--import_path={root}", "--output=ndjson", client=_Throttled(root=str(root)))
+    assert status == 1
+    [summary] = _events(capsys)
+    assert summary["event"] == "summary" and summary["total"] == 0
+    assert "Request was throttled." in summary["error"]
+
+
+def test_locked_journal_is_reported_as_summary(make_decks, run_main, tmp_path, capsys):
+    root = make_decks(2)
+    running = SyncJournal(journal_path(tmp_path / "journal", "local", str(root)))
+    running.start("local", str(root), [])
+    try:
+        assert run_main(f"--import_path={root}", "--output=ndjson") == 1
+    finally:
+        running.close()
+    [summary] = _events(capsys)
+    assert summary["event"] == "summary" and "Another sync" in summary["error"]
+
+
+def test_index_query_events(make_decks, run_main, capsys):
+    root = make_decks(3)
+    run_main(f"--import_path={root}", "--jobs=1")
+    capsys.readouterr()
+
+    run_main("--find_card=Sol Ring", "--output=ndjson")
+    events = _events(capsys)
+    assert [event["event"] for event in events] == ["card"] * 3 + ["summary"]
+    assert {event["deck_id"] for event in events[:-1]} == {"deck0000.txt", "deck0001.txt", "deck0002.txt"}
+
+    run_main("--card_totals", "--limit=2", "--output=ndjson")
+    events = _events(capsys)
+    assert [event["event"] for event in events] == ["total", "total", "summary"]
+    assert events[-1]["decks"] == 3
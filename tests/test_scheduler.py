@@ -0,0 +1,68 @@
+import json
+
+from deck2trice.journal import SyncJournal, journal_path
+from deck2trice.scheduler import PIN_WINDOW, Budget, prioritize
+
+
+def test_prioritize_orders_carried_then_by_day_with_pinned_first():
+    day = 10 * PIN_WINDOW
+    updated = {"a": day + 500, "b": day + 100, "c": day - 100, "d": 0}
+    assert prioritize(list("abcd"), updated) == list("abcd")
+    assert prioritize(list("abcd"), updated, pinned=["b"]) == list("bacd")
+    # Pinning never lifts a deck above more recent days
+    assert prioritize(list("abcd"), updated, pinned=["c"]) == list("abcd")
+    assert prioritize(list("abcd"), updated, pinned=["c"], carried=["d"]) == list("dabc")
+
+
+def test_prioritize_keeps_config_order_without_update_times():
+    assert prioritize(["c", "a", "b", "a"], {}, pinned=["c", "a", "b"]) == ["c", "a", "b"]
+
+
+def test_budget_exhausted():
+    budget = Budget(requests=2)
+    assert budget.exhausted() is None
+    budget.spend(2)
+    assert budget.exhausted() == "budget of 2 request(s)"
+    assert Budget().exhausted() is None
+
+
+def _deck_events(capsys):
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return [e["id"] for e in events if e["event"] == "deck"]
+
+
+def test_carry_over_survives_syncs_of_other_accounts(make_decks, run_main, tmp_path, capsys):
+    first, other = make_decks(5, "first"), make_decks(2, "other")
+    common = ("--jobs=1", "--output=ndjson")
+
+    # The listing is one request, so two decks fit
+    run_main(f"--import_path={first}", "--max_requests=3", *common)
+    synced = _deck_events(capsys)
+    assert len(synced) == 2
+    state = SyncJournal(journal_path(tmp_path / "journal", "local", str(first.resolve()))).load()
+    assert len(state.carried) == 3
+
+    run_main(f"--import_path={other}", *common)
+    assert len(_deck_events(capsys)) == 2
+
+    run_main(f"--import_path={first}", *common)
+    assert _deck_events(capsys)[:3] == state.carried
+
+
+def test_spent_budget_starts_no_deck(make_decks, run_main, tmp_path, capsys):
+    root = make_decks(3)
+    # The listing spends the only request
+    run_main(f"--import_path={root}", "--max_requests=1", "--jobs=1", "--output=ndjson")
+    assert _deck_events(capsys) == []
+    assert not list((tmp_path / "out").glob("*.cod"))
+
+
+def test_parallel_sync_writes_no_deck_past_the_budget(make_decks, run_main, tmp_path, capsys):
+    root = make_decks(200)
+    run_main(f"--import_path={root}", "--max_requests=11", "--jobs=2", "--layout=flat", "--output=ndjson")
+    synced = _deck_events(capsys)
+    assert len(synced) == 10
+    assert len(list((tmp_path / "out").glob("*.cod"))) == 10
+    state = SyncJournal(journal_path(tmp_path / "journal", "local", str(root.resolve()))).load()
+    assert sorted(state.done) == sorted(synced)
+    assert len(state.carried) == 190
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from deck2trice.workqueue import LocalWorkQueue, SQLiteWorkQueue, create_work_queue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    queue = LocalWorkQueue() if request.param == "memory" else SQLiteWorkQueue(tmp_path / "queue.sqlite")
+    yield queue
+    queue.close()
+
+
+def _expire(queue, lease):
+    """Make `lease` run out now instead of waiting for its visibility timeout."""
+    if isinstance(queue, LocalWorkQueue):
+        queue._jobs[(lease.source, lease.deck_id)].expires = time.time() - 1
+    else:
+        queue.conn.execute(
+            "UPDATE jobs SET expires = ? WHERE source = ? AND deck_id = ?",
+            (time.time() - 1, lease.source, lease.deck_id),
+        )
+
+
+def test_enqueue_is_idempotent_until_done(queue):
+    assert queue.enqueue("moxfield", "alice", ["a", "b"]) == 2
+    assert queue.enqueue("moxfield", "alice", ["a", "b", "c"]) == 1
+    # The same id on another source is another deck
+    assert queue.enqueue("archidekt", "alice", ["a"]) == 1
+    assert queue.counts() == {"pending": 4, "leased": 0, "done": 0, "failed": 0}
+
+    lease = queue.lease("w1", 60)
+    assert queue.ack(lease, path="a.cod")
+    assert queue.enqueue("moxfield", "alice", ["a"]) == 1
+
+
+def test_leases_in_order_and_hides_leased_jobs(queue):
+    queue.enqueue("moxfield", "alice", ["a", "b"])
+    first, second = queue.lease("w1", 60), queue.lease("w2", 60)
+    assert (first.deck_id, second.deck_id) == ("a", "b")
+    assert (first.username, first.attempts) == ("alice", 1)
+    assert queue.lease("w3", 60) is None
+    assert queue.counts()["leased"] == 2
+
+
+def test_expired_lease_is_leased_again(queue):
+    queue.enqueue("moxfield", "alice", ["a"])
+    lease = queue.lease("w1", 60)
+    _expire(queue, lease)
+    again = queue.lease("w2", 60)
+    assert (again.deck_id, again.attempts) == ("a", 2)
+    assert again.token != lease.token
+
+
+def test_stale_and_expired_leases_cannot_ack(queue):
+    queue.enqueue("moxfield", "alice", ["a"])
+    lease = queue.lease("w1", 60)
+    _expire(queue, lease)
+    assert not queue.ack(lease)
+
+    again = queue.lease("w2", 60)
+    # The first worker's token no longer holds the job
+    assert not queue.ack(lease)
+    assert not queue.fail(lease, "late")
+    assert queue.ack(again, path="a.cod")
+    assert queue.counts()["done"] == 1
+
+
+def test_failed_job_goes_behind_waiting_jobs(queue):
+    queue.enqueue("moxfield", "alice", ["a", "b", "c"])
+    lease = queue.lease("w1", 60)
+    assert lease.deck_id == "a"
+    assert queue.fail(lease, "boom")
+    assert [queue.lease("w1", 60).deck_id for _ in range(3)] == ["b", "c", "a"]
+
+
+def test_fails_after_max_attempts(queue):
+    queue.enqueue("moxfield", "alice", ["a"])
+    for attempt in (1, 2):
+        lease = queue.lease("w1", 60)
+        assert lease.attempts == attempt
+        queue.fail(lease, "boom", max_attempts=3)
+        assert queue.counts()["pending"] == 1
+    queue.fail(queue.lease("w1", 60), "boom", max_attempts=3)
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    assert queue.lease("w1", 60) is None
+
+
+def test_expired_leases_fail_after_max_attempts(queue):
+    queue.enqueue("moxfield", "alice", ["a"])
+    for attempt in (1, 2):
+        lease = queue.lease("w1", 60, max_attempts=2)
+        assert lease.attempts == attempt
+        _expire(queue, lease)
+    assert queue.lease("w1", 60, max_attempts=2) is None
+    assert queue.counts()["failed"] == 1
+
+
+def test_create_work_queue(tmp_path):
+    assert isinstance(create_work_queue("memory"), LocalWorkQueue)
+    queue = create_work_queue(f"sqlite:{tmp_path / 'queue.sqlite'}")
+    assert isinstance(queue, SQLiteWorkQueue)
+    queue.close()
+
+
+def test_sqlite_queue_is_shared_between_connections(tmp_path):
+    path = tmp_path / "queue.sqlite"
+    first, second = SQLiteWorkQueue(path), SQLiteWorkQueue(path)
+    first.enqueue("moxfield", "alice", ["a", "b"])
+    leases = [first.lease("w1", 60), second.lease("w2", 60)]
+    assert sorted(lease.deck_id for lease in leases) == ["a", "b"]
+    assert first.lease("w1", 60) is None
+    assert second.ack(leases[0])
+    assert first.counts()["done"] == 1
+    first.close()
+    second.close()